@@ -0,0 +1,208 @@
+from pathlib import Path
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from json_index import PathIndex, iter_nodes, walk
+from json_io import read_json
+from register import REGISTER_COLUMNS, read_register
+from synthetic_fleet import make_fleet, make_register
+from unit_rules import check_units, compile_rules
+
+HERE = Path(__file__).resolve().parent
+
+
+def load_script(file_name):
+    """Import one of the CLI scripts (some have '-' in their names) as a module."""
+    spec = importlib.util.spec_from_file_location(Path(file_name).stem.replace("-", "_"), HERE / file_name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def recursive_nodes(d, prefix="$"):
+    """iter_nodes as it was before the explicit-stack walk: one nested generator per level, kept as the reference."""
+    if isinstance(d, dict):
+        for k, value in d.items():
+            path = f"{prefix}.{k}"
+            yield path, d, k, value
+            yield from recursive_nodes(value, path)
+    elif isinstance(d, list):
+        for i, value in enumerate(d):
+            path = f"{prefix}[{i}]"
+            yield path, d, i, value
+            yield from recursive_nodes(value, path)
+
+
+def measure(name, func, files, repeat, setup=None):
+    """Best-of-repeat wall time of func(), then one more run under tracemalloc for the peak memory."""
+    best = None
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        for _ in range(repeat):
+            if setup:
+                setup()
+            with contextlib.redirect_stdout(devnull):
+                start = time.perf_counter()
+                func()
+                elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(devnull):
+                func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    result = {"name": name, "files": files, "seconds": best, "files_per_sec": files / best if best else None,
+              "peak_mib": peak / (1 << 20)}
+    print(f"⏱ {name:<32} {best:8.3f} s  {result['files_per_sec']:10.1f} files/s  "
+          f"peak {result['peak_mib']:7.1f} MiB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the hot paths on a synthetic device fleet')
+    parser.add_argument('--devices', type=int, default=200, help='Number of devices (default: 200)')
+    parser.add_argument('--points', type=int, default=80, help='Points per device (default: 80)')
+    parser.add_argument('--depth', type=int, default=0, help='Extra nesting levels under pointset.points')
+    parser.add_argument('--rules', default=str(HERE / "keyword.json"), help='Unit rules (default: keyword.json)')
+    parser.add_argument('--repeat', type=int, default=3, help='Rounds per benchmark, best is reported (default: 3)')
+    parser.add_argument('--workdir', default=None, help='Where to generate the fleet (default: a temp dir)')
+    parser.add_argument('--keep', action='store_true', help='Keep the generated fleet and register')
+    parser.add_argument('--json', default=None, help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    with open(args.rules, "r", encoding="utf-8") as f:
+        raw_rules = json.load(f)
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="json_scripts_bench_"))
+    fleet = workdir / "fleet"
+    scratch = workdir / "scratch"
+    register_file = workdir / "register.xlsx"
+    reports = {name: workdir / f"{name}_report.txt" for name in ("search", "modify", "cgw")}
+    try:
+        if fleet.exists():
+            shutil.rmtree(fleet)
+        names = make_fleet(fleet, args.devices, args.points, args.depth, raw_rules)
+        make_register(register_file, names)
+        files = sorted(fleet.rglob("metadata.json"))
+        docs = [read_json(path)[0] for path in files]
+        size = sum(path.stat().st_size for path in files)
+        print(f"📂 {len(files)} devices x {args.points} points, depth {args.depth}, "
+              f"{size / (1 << 20):.1f} MiB in {workdir}")
+
+        def fresh_copy():
+            if scratch.exists():
+                shutil.rmtree(scratch)
+            shutil.copytree(fleet, scratch)
+
+        n = len(files)
+        results = []
+
+        def walk_recursive():
+            for doc in docs:
+                for _ in recursive_nodes(doc):
+                    pass
+        results.append(measure("recursive generators (reference)", walk_recursive, n, args.repeat))
+
+        def walk_strings():
+            for doc in docs:
+                for _ in iter_nodes(doc):
+                    pass
+        results.append(measure("iter_nodes (string paths)", walk_strings, n, args.repeat))
+
+        def walk_tuples():
+            for doc in docs:
+                for _ in walk(doc):
+                    pass
+        results.append(measure("walk (tuple paths)", walk_tuples, n, args.repeat))
+
+        for mode in ("search", "suffix"):
+            def check(mode=mode):
+                rules = compile_rules(raw_rules, mode)
+                for doc in docs:
+                    check_units(doc, rules)
+            results.append(measure(f"check_units ({mode})", check, n, args.repeat))
+
+        loc = load_script("location-update_scripts.py")
+        indexes = []
+        segments = "system.location.zone".split(".")
+
+        def fresh_indexes():
+            indexes[:] = [PathIndex(doc) for doc in docs]
+
+        def best_match():
+            # the first lookup on each index builds its segment index, as in process_file
+            for index in indexes:
+                loc.find_best_match_segments(segments, index)
+        results.append(measure("find_best_match_segments", best_match, n, args.repeat, setup=fresh_indexes))
+        results.append(measure("find_best_match_segments (built)", best_match, n, args.repeat))
+
+        columns = [col for col in REGISTER_COLUMNS.values() if col != 'Devices']
+        rows = {row['Devices']: row for row in read_register(register_file)}
+
+        def process_files():
+            for path in sorted(scratch.rglob("metadata.json")):
+                loc.process_file(path, rows[path.parent.name], columns)
+        results.append(measure("process_file", process_files, n, args.repeat, setup=fresh_copy))
+
+        def location_cli():
+            argv = sys.argv
+            sys.argv = ["location-update_scripts.py", "-i", str(register_file), "--root", str(scratch),
+                        "--index-cache", "", "--register-cache", "", "--journal-dir", ""]
+            try:
+                loc.main()
+            finally:
+                sys.argv = argv
+        results.append(measure("location-update_scripts.py", location_cli, n, args.repeat, setup=fresh_copy))
+
+        search = load_script("search.py")
+        search.output_file = reports["search"]
+        rules = compile_rules(raw_rules, "search")
+        results.append(measure("search.py", lambda: search.search_and_check_files(fleet, rules), n, args.repeat))
+
+        modify = load_script("search-modify.py")
+        modify.output_file = reports["modify"]
+        suffix_rules = compile_rules(raw_rules, "suffix")
+        results.append(measure("search-modify.py",
+                               lambda: modify.search_and_check_files(scratch, suffix_rules, auto_fix=True),
+                               n, args.repeat, setup=fresh_copy))
+
+        cgw = load_script("search_cgw.py")
+        cgw.output_file = reports["cgw"]
+        results.append(measure("search_cgw.py", lambda: cgw.run_cgw_folder_scan(scratch, rules),
+                               n, args.repeat, setup=fresh_copy))
+
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump({"devices": args.devices, "points": args.points, "depth": args.depth,
+                           "results": results}, f, indent=2)
+            print(f"📝 Results saved to: {args.json}")
+    finally:
+        if args.keep:
+            print(f"📂 Kept the fleet and register in {workdir}")
+        elif args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            # a --workdir may hold other things; only remove what the bench wrote there
+            shutil.rmtree(fleet, ignore_errors=True)
+            shutil.rmtree(scratch, ignore_errors=True)
+            register_file.unlink(missing_ok=True)
+            for report in reports.values():
+                for suffix in (".txt", ".jsonl", ".csv"):
+                    report.with_suffix(suffix).unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
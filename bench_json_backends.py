@@ -0,0 +1,58 @@
+from pathlib import Path
+import argparse
+import json
+import time
+
+import json_io
+
+
+def time_it(func, items, repeat):
+    """Best-of-repeat seconds for calling func on every item once."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the JSON backends on metadata samples')
+    parser.add_argument('files', nargs='*', default=["floor/*/metadata.json"],
+                        help='Files or glob patterns (default: floor/*/metadata.json)')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Rounds per measurement; the best round is reported (default: 20)')
+    args = parser.parse_args()
+
+    paths = []
+    for pattern in args.files:
+        paths.extend(sorted(Path().glob(pattern)) if any(c in pattern for c in "*?[") else [Path(pattern)])
+    samples = [path.read_bytes() for path in paths]
+    if not samples:
+        print("❌ No sample files found")
+        return
+    docs = [json.loads(raw.decode("utf-8")) for raw in samples]
+    size = sum(len(raw) for raw in samples)
+    print(f"📂 {len(samples)} files, {size / 1024:.1f} KiB, best of {args.repeat} rounds")
+
+    json_io.use_backend("json")
+    expected = [json_io.dump_json(doc) for doc in docs]
+
+    baseline = {}
+    for name in json_io.BACKENDS:
+        json_io.use_backend(name)
+        identical = [json_io.dump_json(doc) for doc in docs] == expected
+        load = time_it(json_io.loads, samples, args.repeat)
+        dump = time_it(json_io.dump_json, docs, args.repeat)
+        baseline.setdefault("load", load)
+        baseline.setdefault("dump", dump)
+        print(f"⏱ {name:<8} load {load * 1000:8.2f} ms ({baseline['load'] / load:5.1f}x)  "
+              f"dump {dump * 1000:8.2f} ms ({baseline['dump'] / dump:5.1f}x)  "
+              f"{'✅ identical output' if identical else '❌ OUTPUT DIFFERS'}")
+    json_io.use_backend()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import json
+import os
+from pathlib import Path
+
+CACHE_VERSION = 1
+
+
+def _scan_dir(path, filename):
+    """List one directory: its subdirectory names and whether it holds filename."""
+    subdirs = []
+    has_file = False
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.name)
+            elif entry.name == filename and entry.is_file():
+                has_file = True
+    subdirs.sort()
+    return subdirs, has_file
+
+
+def _load_cache(cache_file, root, filename):
+    """Return the cached directory listings if they were made for the same root and filename."""
+    if not cache_file or not Path(cache_file).exists():
+        return {}
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if (cache.get("version") != CACHE_VERSION or cache.get("root") != str(root)
+            or cache.get("filename") != filename):
+        return {}
+    return cache.get("dirs", {})
+
+
+def _save_cache(cache_file, root, filename, dirs):
+    tmp_file = f"{cache_file}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"version": CACHE_VERSION, "root": str(root), "filename": filename, "dirs": dirs}, f)
+    os.replace(tmp_file, cache_file)
+
+
+class DeviceIndex:
+    """Map of device folder name -> metadata files below it, built from one directory walk.
+
+    With a cache file, each directory's listing is stored with its mtime; on
+    the next run a directory whose mtime is unchanged is not listed again, so
+    only subtrees where entries were added, removed or renamed are rescanned.
+    """
+
+    def __init__(self, root, filename, cache_file=None):
+        self.root = Path(root)
+        self.filename = filename
+        self.scanned = 0
+        self.reused = 0
+
+        cached = _load_cache(cache_file, self.root, filename)
+        dirs = {}
+        stack = [""]
+        while stack:
+            rel = stack.pop()
+            full = self.root / rel if rel else self.root
+            try:
+                mtime = os.stat(full).st_mtime_ns
+                entry = cached.get(rel)
+                if entry is not None and entry["mtime"] == mtime:
+                    subdirs, has_file = entry["subdirs"], entry["has_file"]
+                    self.reused += 1
+                else:
+                    subdirs, has_file = _scan_dir(full, filename)
+                    self.scanned += 1
+            except OSError:
+                continue
+            dirs[rel] = {"mtime": mtime, "subdirs": subdirs, "has_file": has_file}
+            stack.extend(f"{rel}/{name}" if rel else name for name in subdirs)
+
+        if cache_file:
+            try:
+                _save_cache(cache_file, self.root, filename, dirs)
+            except OSError as e:
+                print(f"⚠️ Could not write device index cache {cache_file}: {e}")
+
+        self.devices = {}
+        # files directly under root belong to no device
+        self.root_files = [self.root / filename] if dirs.get("", {}).get("has_file") else []
+        for rel in sorted(dirs):
+            if rel and dirs[rel]["has_file"]:
+                device = rel.split("/", 1)[0]
+                self.devices.setdefault(device, []).append(self.root / rel / filename)
+        self._lower = {}
+        for device in self.devices:
+            self._lower.setdefault(device.lower(), device)
+
+    def files(self, device):
+        """Return the metadata files under root/<device>, like (root / device).rglob(filename)."""
+        if "/" in device or "\\" in device:
+            # nested device paths aren't keyed in the index, walk them directly
+            return list((self.root / device).rglob(self.filename))
+        found = self.devices.get(device)
+        if found is None:
+            # device folders are matched case-insensitively on Windows shares
+            found = self.devices.get(self._lower.get(device.lower()), [])
+        return list(found)
+
+    def all_files(self):
+        """Return every indexed metadata file, like root.rglob(filename)."""
+        return self.root_files + [file for files in self.devices.values() for file in files]
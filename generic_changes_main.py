@@ -1,19 +1,11 @@
 from pathlib import Path
-import re
+import argparse
 import json
-from jsonpath_ng import parse
 import pandas as pd 
 
-def get_paths(d):
-    """Recursively yield JSONPath-like paths from JSON data."""
-    if isinstance(d, dict):
-        for key, value in d.items():
-            yield f'.{key}'
-            yield from (f'.{key}{p}' for p in get_paths(value))
-    elif isinstance(d, list):
-        for i, value in enumerate(d):
-            yield f'[{i}]'
-            yield from (f'[{i}]{p}' for p in get_paths(value))
+from json_index import iter_nodes
+from metrics import add_arguments, count, instrumented, phase
+from unit_rules import compile_rules
 
 search_root = Path("E:/temp_projects/json_values_checker/devices/")
 target_filename = "metadata.json"
@@ -21,56 +13,63 @@ target_filename = "metadata.json"
 output_file = Path("E:/temp_projects/json_values_checker/unit_check_report.txt")
 
 input_file_path = 'input.xlsx'  # or the full path if needed
-df = pd.read_excel(input_file_path,sheet_name='Main', engine='openpyxl')
 
-df = df.fillna("")
+parser = argparse.ArgumentParser(description='Set the values of input.xlsx columns in each device\'s metadata.json')
+add_arguments(parser)
+args = parser.parse_args()
 
-df.to_dict()
+with instrumented(args.metrics, args.profile):
+    with phase("register"):
+        df = pd.read_excel(input_file_path,sheet_name='Main', engine='openpyxl')
 
-#print(type(df))
+    df = df.fillna("")
 
-all_col = list(df.columns)
-exclude_col = 'Devices'
-columns = [col for col in all_col if col != exclude_col]
-req_df = df[columns]
-#print(f"Columns in DataFrame: {columns}")
+    df.to_dict()
 
-# Accessing columns
-i=0
-for index, row in df.iterrows():
-    device = row['Devices'].strip()
-    #path = row['Path']
-    root_dir = Path(str(search_root) + "\\" + device + "\\")
-    #print(f"Root Directory: {root_dir}")
+    #print(type(df))
 
-    matched_files = list(root_dir.rglob(target_filename))
-    if not matched_files:
-        print("No matching files found.")
-    else:
-        for file in matched_files:
-            print(f"Found file: {file}")
-            with file.open("r", encoding="utf-8") as f:
-                json_data = json.load(f)
-                #stats = {}
-                paths = ['$' + s for s in get_paths(json_data)]
-                #print(f"Paths in JSON: {paths}")
-                
-                for keyword, value in req_df.items():
+    all_col = list(df.columns)
+    exclude_col = 'Devices'
+    columns = [col for col in all_col if col != exclude_col]
+    req_df = df[columns]
+    # one suffix rule per column; only the matching is used, not the units
+    rules = compile_rules({keyword: None for keyword in columns}, "suffix")
+    #print(f"Columns in DataFrame: {columns}")
+
+    # Accessing columns
+    i=0
+    for index, row in df.iterrows():
+        device = row['Devices'].strip()
+        #path = row['Path']
+        root_dir = Path(str(search_root) + "\\" + device + "\\")
+        #print(f"Root Directory: {root_dir}")
 
-                    matching_paths = [p for p in paths if re.search(rf"\.{re.escape(keyword)}$", p, re.IGNORECASE)]
-                    print(f"Matching paths for keyword '{keyword}': {matching_paths}")
-                    pass_count = 0
-                    fail_count = 0
+        with phase("discover"):
+            matched_files = list(root_dir.rglob(target_filename))
+        count("files_discovered", len(matched_files))
+        if not matched_files:
+            print("No matching files found.")
+        else:
+            for file in matched_files:
+                print(f"Found file: {file}")
+                with file.open("r", encoding="utf-8") as f:
+                    json_data = json.load(f)
+                    #stats = {}
+                    matches_by_rule = [[] for _ in range(len(rules))]
+                    for node in iter_nodes(json_data):
+                        for idx in rules.match(node[0]):
+                            matches_by_rule[idx].append(node)
+                    #print(f"Paths in JSON: {paths}")
+                
+                    for (keyword, value), matching_nodes in zip(req_df.items(), matches_by_rule):
 
-                    for path_str in matching_paths:
-                        path_expr = parse(path_str)
-                        matches = path_expr.find(json_data)
-                        #print(f"Matches found for path '{path_str}': {matches}")
+                        print(f"Matching paths for keyword '{keyword}': {[n[0] for n in matching_nodes]}")
+                        pass_count = 0
+                        fail_count = 0
 
-                        for match in matches:
-                            #print(f"Match found: {match.value}")
-                            #if isinstance(match.value, dict):
-                            keys = match.value
+                        for path_str, parent, key, _ in matching_nodes:
+                            #print(f"Match found: {parent[key]}")
+                            keys = parent[key]
                             print(keys , "Print keys")
                             print("Keyword: ", keyword)
                             print(i)
@@ -81,14 +80,14 @@ for index, row in df.iterrows():
                                 print(f"Pass count for {keyword}: {pass_count}")
                             else:
                                 fail_count += 1
-                                path_expr.update(json_data,str(req_df.loc[i,keyword]))
+                                parent[key] = str(req_df.loc[i,keyword])
                                
                             
         
-    i= i + 1
+        i= i + 1
           
-with file.open("w", encoding="utf-8") as f_write:
-    json.dump(json_data, f_write, indent=2)  
+    with file.open("w", encoding="utf-8") as f_write:
+        json.dump(json_data, f_write, indent=2)  
 
-    # print(f"Device: {device}, Value: {value}")
+        # print(f"Device: {device}, Value: {value}")
 
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+from json_io import CHANGED, read_json, write_json
+from manifest import content_hash
+from patches import invert_edits, revert_edits
+
+DEFAULT_JOURNAL_DIR = ".journal"
+
+
+def new_run_id():
+    """Run ids sort by start time: 20261017T083000-4242."""
+    return f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+
+
+class Journal:
+    """Append-only record of every file a run rewrote, enough to undo the run.
+
+    One JSON line per written file: the file, the sha256 before and after the
+    write and the (op, pointer, old, new) edits that were made, see patches.py.
+    Lines are flushed as they are written so a crashed run can still be undone.
+    """
+
+    def __init__(self, journal_dir=DEFAULT_JOURNAL_DIR, run_id=None):
+        self.run_id = run_id or new_run_id()
+        self.files = 0
+        # files may be written from several threads (see pipeline.py)
+        self._lock = threading.Lock()
+        Path(journal_dir).mkdir(parents=True, exist_ok=True)
+        self.journal_file = Path(journal_dir) / f"{self.run_id}.jsonl"
+        self._out = self.journal_file.open("a", encoding="utf-8")
+        header = {"run": self.run_id, "started": datetime.now().isoformat(timespec="seconds"), "argv": sys.argv}
+        self._write(header)
+
+    def _write(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._out.write(line)
+            self._out.flush()
+
+    def record(self, file_path, pre_digest, post_digest, edits):
+        """Journal one rewritten file, by absolute path so an undo works from any directory."""
+        self._write({"file": str(Path(file_path).resolve()), "pre": pre_digest, "post": post_digest,
+                     "edits": [list(edit) for edit in edits or ()]})
+        with self._lock:
+            self.files += 1
+
+    def close(self):
+        self._out.close()
+        if self.files:
+            print(f"🧾 Journaled {self.files} file changes as run {self.run_id} "
+                  f"(undo with: python journal.py undo {self.run_id})")
+
+
+class PendingJournal:
+    """Collects journal records in a worker process so the parent can write them."""
+
+    def __init__(self):
+        self.entries = []
+
+    def record(self, file_path, pre_digest, post_digest, edits):
+        self.entries.append((str(Path(file_path).resolve()), pre_digest, post_digest, list(edits or ())))
+
+
+def load_run(journal_dir, run_id):
+    """Return the file records of a run, in the order they were written."""
+    journal_file = Path(journal_dir) / f"{run_id}.jsonl"
+    records = []
+    with journal_file.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # a run killed mid-write can leave a partial last line
+                continue
+            if "file" in record:
+                records.append(record)
+    return records
+
+
+def undo_run(journal_dir, run_id):
+    """Revert every file a run rewrote, refusing files that changed since.
+
+    Returns (reverted, refused). The undo is itself journaled as a new run.
+    """
+    by_file = OrderedDict()
+    for record in load_run(journal_dir, run_id):
+        by_file.setdefault(record["file"], []).append(record)
+
+    journal = Journal(journal_dir)
+    reverted = refused = 0
+    try:
+        for file_name, records in by_file.items():
+            file_path = Path(file_name)
+            try:
+                json_data, original = read_json(file_path)
+            except (OSError, ValueError) as e:
+                print(f"⛔ Not reverting {file_path}: {e}")
+                refused += 1
+                continue
+            if content_hash(original) != records[-1]["post"]:
+                print(f"⛔ Not reverting {file_path}: it changed after run {run_id}")
+                refused += 1
+                continue
+
+            edits = []
+            for record in records:
+                edits.extend(tuple(edit) for edit in record["edits"])
+            try:
+                revert_edits(json_data, edits)
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                # a recorded pointer that doesn't resolve in the file, e.g. from an older run
+                print(f"⛔ Not reverting {file_path}: its journaled edits don't apply ({e!r})")
+                refused += 1
+                continue
+            if write_json(file_path, json_data, original, journal, invert_edits(edits)) == CHANGED:
+                reverted += 1
+                if content_hash(file_path.read_bytes()) != records[0]["pre"]:
+                    print(f"↩️ Reverted {file_path} (values restored, formatting differs from the original)")
+                else:
+                    print(f"↩️ Reverted {file_path}")
+    finally:
+        journal.close()
+    return reverted, refused
+
+
+def list_runs(journal_dir):
+    for journal_file in sorted(Path(journal_dir).glob("*.jsonl")):
+        with journal_file.open("r", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            files = sum(1 for line in f if line.strip())
+        print(f"{journal_file.stem}  {files:>6} files  {' '.join(header.get('argv', []))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or undo journaled bulk edits')
+    parser.add_argument('--journal-dir', default=DEFAULT_JOURNAL_DIR,
+                        help='Directory holding the run journals')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='List journaled runs')
+    undo = commands.add_parser('undo', help='Revert every file a run changed')
+    undo.add_argument('run_id', help='Run id, as printed at the end of the run')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        list_runs(args.journal_dir)
+    elif args.command == 'undo':
+        reverted, refused = undo_run(args.journal_dir, args.run_id)
+        print(f"\n📊 Reverted {reverted} files, refused {refused}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+from patches import pointer_from_keys, snapshot
+
+
+def _children(value):
+    """(key, child) pairs of a dict or list, None for anything else."""
+    if isinstance(value, dict):
+        return iter(value.items())
+    if isinstance(value, list):
+        return enumerate(value)
+    return None
+
+
+def walk(d):
+    """Yield (keys, parent, key, value) for every value below d, in document order.
+
+    keys is the tuple of dict keys / list indices leading from d to value;
+    format_path() turns it into the '$.a.b[0].c' string iter_nodes yields,
+    so callers that only look at some paths pay for formatting just those.
+    Uses an explicit stack, so deeply nested documents don't hit the
+    recursion limit.
+    """
+    children = _children(d)
+    if children is None:
+        return
+    stack = [((), d, children)]
+    while stack:
+        keys, parent, children = stack[-1]
+        for key, value in children:
+            path = keys + (key,)
+            yield path, parent, key, value
+            below = _children(value)
+            if below is not None:
+                # descend; this container's iterator picks up where it left off afterwards
+                stack.append((path, value, below))
+                break
+        else:
+            stack.pop()
+
+
+def format_path(keys, prefix="$"):
+    """Format a keys tuple from walk() as a JSONPath-like string, e.g. '$.a.b[0].c'."""
+    if not keys:
+        return prefix
+    try:
+        # dict keys only, the common case
+        return f"{prefix}.{'.'.join(keys)}"
+    except TypeError:
+        return prefix + "".join(f"[{k}]" if isinstance(k, int) else f".{k}" for k in keys)
+
+
+def iter_nodes(d, prefix="$"):
+    """Yield (path, parent, key, value) for every value below d, in document order.
+
+    parent[key] is the live reference to value, so callers can read or
+    update matches in place without re-resolving the path string. Like
+    walk(), but with every path formatted.
+    """
+    children = _children(d)
+    if children is None:
+        return
+    stack = [(prefix, d, children)]
+    while stack:
+        prefix, parent, children = stack[-1]
+        for key, value in children:
+            path = f"{prefix}[{key}]" if isinstance(key, int) else f"{prefix}.{key}"
+            yield path, parent, key, value
+            below = _children(value)
+            if below is not None:
+                stack.append((path, value, below))
+                break
+        else:
+            stack.pop()
+
+
+def _same_value(old, new):
+    """Equal and of the same type, so "1" and 1 (or 1 and True) still count as a change."""
+    return type(old) is type(new) and old == new
+
+
+class PathNode:
+    """A single value in a JSON document, addressed through its parent container."""
+    __slots__ = ("parent", "key", "path", "tail", "order", "children", "next_seq", "attached")
+
+    def __init__(self, parent, key, path, order):
+        self.parent = parent
+        self.key = key
+        self.path = path
+        # lowercased text after the last '.', what an endswith('.' + keyword) test looks at
+        self.tail = path.rsplit(".", 1)[-1].lower()
+        self.order = order
+        self.children = {}
+        self.next_seq = 0
+        self.attached = True
+
+
+class PathIndex:
+    """Index of every path in a JSON document, built once and kept in sync with edits.
+
+    Paths are JSONPath-like strings without the leading "$" ('.a.b[0].c').
+    Lookups by trailing segment are O(1); every node keeps a parent pointer so
+    edits can be made directly on the live containers. Every edit is also
+    recorded in self.edits as (op, pointer, old, new), see patches.py.
+    """
+
+    def __init__(self, json_data):
+        self.data = json_data
+        self.root = PathNode(None, None, "", ())
+        self.by_tail = {}
+        # segment -> nodes whose path has it, built on the first segments() call
+        self.by_segment = None
+        self.edits = []
+        self._add_children(self.root, json_data)
+
+    def pointer(self, node):
+        """Return the JSON Pointer of node."""
+        keys = []
+        while node.parent is not None:
+            keys.append(node.key)
+            node = node.parent
+        return pointer_from_keys(reversed(keys))
+
+    def value(self, node):
+        """Return the current value stored at node."""
+        keys = []
+        while node.parent is not None:
+            keys.append(node.key)
+            node = node.parent
+        value = self.data
+        for key in reversed(keys):
+            value = value[key]
+        return value
+
+    def container(self, node):
+        """Return the dict or list that holds node."""
+        return self.value(node.parent)
+
+    def _attach(self, parent, key, value):
+        node = self._new_node(parent, key)
+        self._add_children(node, value)
+        return node
+
+    def _new_node(self, parent, key):
+        """Create and index the node for parent[key], without anything below it."""
+        if isinstance(key, int):
+            path = f"{parent.path}[{key}]"
+        else:
+            path = f"{parent.path}.{key}"
+        node = PathNode(parent, key, path, parent.order + (parent.next_seq,))
+        parent.next_seq += 1
+        parent.children[key] = node
+        self.by_tail.setdefault(node.tail, []).append(node)
+        if self.by_segment is not None:
+            self._index_segments(node)
+        return node
+
+    def _add_children(self, node, value):
+        """Index everything below node, in document order, with an explicit stack like walk()."""
+        children = _children(value)
+        if children is None:
+            return
+        stack = [(node, children)]
+        while stack:
+            parent, children = stack[-1]
+            for key, child in children:
+                child_node = self._new_node(parent, key)
+                below = _children(child)
+                if below is not None:
+                    stack.append((child_node, below))
+                    break
+            else:
+                stack.pop()
+
+    def _detach_children(self, node):
+        stack = list(node.children.values())
+        node.children = {}
+        while stack:
+            child = stack.pop()
+            child.attached = False
+            self.by_tail[child.tail].remove(child)
+            if self.by_segment is not None:
+                self._unindex_segments(child)
+            stack.extend(child.children.values())
+
+    @staticmethod
+    def _path_segments(node):
+        return {seg for seg in node.path.strip(".").split(".") if seg}
+
+    def _index_segments(self, node):
+        for seg in self._path_segments(node):
+            self.by_segment.setdefault(seg, set()).add(node)
+
+    def _unindex_segments(self, node):
+        for seg in self._path_segments(node):
+            self.by_segment[seg].discard(node)
+
+    def find_suffix(self, keyword):
+        """Return nodes whose path ends with '.<keyword>' (case-insensitive), in document order."""
+        suffix = "." + keyword.lower()
+        tail = suffix.rsplit(".", 1)[-1]
+        candidates = self.by_tail.get(tail, ())
+        if "." in keyword:
+            candidates = [n for n in candidates if n.path.lower().endswith(suffix)]
+        return sorted(candidates, key=lambda n: n.order)
+
+    def segments(self):
+        """Return the inverted index {segment: set of nodes}, segments being the non-empty
+        parts of a path split on '.' ('.a.b[0].c' -> a, b[0], c). Built once, then kept in
+        sync with edits."""
+        if self.by_segment is None:
+            self.by_segment = {}
+            for bucket in self.by_tail.values():
+                for node in bucket:
+                    self._index_segments(node)
+        return self.by_segment
+
+    def set_value(self, node, value):
+        """Replace the value stored at node, re-indexing anything below it.
+
+        Returns False (and leaves the document alone) if node already holds value.
+        """
+        old = self.value(node)
+        if _same_value(old, value):
+            return False
+        self.edits.append(("replace", self.pointer(node), snapshot(old), snapshot(value)))
+        self._detach_children(node)
+        self.container(node)[node.key] = value
+        self._add_children(node, value)
+        return True
+
+    def delete(self, node):
+        """Remove node (and everything below it) from its parent container."""
+        container = self.container(node)
+        position = list(container).index(node.key) if isinstance(container, dict) else None
+        self.edits.append(("remove", self.pointer(node), snapshot(self.value(node)), position))
+        self._detach_children(node)
+        node.attached = False
+        self.by_tail[node.tail].remove(node)
+        if self.by_segment is not None:
+            self._unindex_segments(node)
+        del node.parent.children[node.key]
+        del container[node.key]
+
+    def set_nested(self, path_parts, value):
+        """Create intermediate dicts if missing (replacing non-dicts) and set value at the final key.
+
+        Returns True if the document changed.
+        """
+        current = self.root
+        changed = False
+        for part in path_parts[:-1]:
+            child = current.children.get(part)
+            if child is None:
+                self.value(current)[part] = {}
+                current = self._attach(current, part, {})
+                self.edits.append(("add", self.pointer(current), None, {}))
+                changed = True
+            else:
+                if not isinstance(self.value(child), dict):
+                    self.set_value(child, {})
+                    changed = True
+                current = child
+        key = path_parts[-1]
+        node = current.children.get(key)
+        if node is None:
+            self.value(current)[key] = value
+            node = self._attach(current, key, value)
+            self.edits.append(("add", self.pointer(node), None, snapshot(value)))
+            return True
+        return self.set_value(node, value) or changed
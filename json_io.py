@@ -0,0 +1,324 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from manifest import content_hash
+from metrics import count, phase
+from patches import unescape_token
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib json module is used without it
+    orjson = None
+
+# write_json outcomes
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+
+# A scalar on its own line of indent=2 output: indent, optional "key": , value, optional comma.
+# Floats orjson writes differently from float.__repr__ (1e16 vs 1e+16, 0.00001 vs 1e-05).
+_FLOAT_LINE = re.compile(rb'( *(?:"(?:[^"\\]|\\.)*": )?)(-?\d+(?:\.\d+)?e[+-]?\d+|-?0\.0000\d*)(,?)$', re.M)
+# What json.dumps(ensure_ascii=True) escapes beyond what orjson does
+_NON_ASCII = re.compile('[\x7f-\U0010ffff]')
+# Maps every digit to b"0", "e" to itself and everything else to a space, so
+# digit runs and exponents can be found with plain substring searches.
+_DIGIT_SHAPE = bytes(48 if 48 <= i <= 57 else 101 if i == 101 else 32 for i in range(256))
+# orjson reads integers beyond 64 bits as floats; json keeps them exact
+_LONG_DIGITS = b"0" * 19
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# json's own (C) scanner: parses one value starting at an index, returning (value, end)
+_scan_value = json.decoder.JSONDecoder().scan_once
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def _stdlib_loads(raw):
+    return json.loads(raw.decode("utf-8"))
+
+
+def _stdlib_dumps(json_data):
+    return json.dumps(json_data, indent=2)
+
+
+def _escape_non_ascii(match):
+    """Same \\uXXXX escapes (surrogate pairs above the BMP) as json.dumps' ensure_ascii."""
+    n = ord(match.group())
+    if n < 0x10000:
+        return '\\u{0:04x}'.format(n)
+    n -= 0x10000
+    return '\\u{0:04x}\\u{1:04x}'.format(0xd800 | ((n >> 10) & 0x3ff), 0xdc00 | (n & 0x3ff))
+
+
+def _float_repr(match):
+    return match.group(1) + repr(float(match.group(2))).encode("ascii") + match.group(3)
+
+
+def _fix_floats(out):
+    """Rewrite the floats orjson formats differently, only looking at lines that may hold one."""
+    shape = out.translate(_DIGIT_SHAPE)
+    line_starts = set()
+    for haystack, needle in ((shape, b"0e"), (out, b"0.0000")):
+        i = haystack.find(needle)
+        while i != -1:
+            line_starts.add(out.rfind(b"\n", 0, i) + 1)
+            i = haystack.find(needle, i + 1)
+    if not line_starts:
+        return out
+    parts = []
+    end = 0
+    for start in sorted(line_starts):
+        match = _FLOAT_LINE.match(out, start)
+        if match:
+            parts.append(out[end:start])
+            parts.append(_float_repr(match))
+            end = match.end()
+    parts.append(out[end:])
+    return b"".join(parts)
+
+
+def _orjson_loads(raw):
+    if _LONG_DIGITS in raw.translate(_DIGIT_SHAPE):
+        return _stdlib_loads(raw)
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        # NaN/Infinity, numbers out of range, ...: let the stdlib accept or reject it
+        return _stdlib_loads(raw)
+
+
+def _orjson_dumps(json_data):
+    """orjson output rewritten to json.dumps(indent=2)'s; None where it can't be."""
+    try:
+        out = orjson.dumps(json_data, option=orjson.OPT_INDENT_2)
+    except TypeError:
+        # non-str keys, integers beyond 64 bits, lone surrogates, ...
+        return None
+    # orjson writes NaN and Infinity as null, json.dumps as NaN / Infinity
+    if b"null" in out and orjson.loads(out) != json_data:
+        return None
+    text = _fix_floats(out).decode("utf-8")
+    if not text.isascii() or "\x7f" in text:
+        text = _NON_ASCII.sub(_escape_non_ascii, text)
+    return text
+
+
+# name -> (loads(raw bytes), dumps(json_data) returning json.dumps(indent=2) text or None)
+BACKENDS = {"json": (_stdlib_loads, _stdlib_dumps)}
+if orjson is not None:
+    BACKENDS["orjson"] = (_orjson_loads, _orjson_dumps)
+
+_backend = None
+
+
+def use_backend(name=None):
+    """Select the JSON backend by name; None picks $JSON_BACKEND or the fastest installed one."""
+    global _backend
+    name = name or os.environ.get("JSON_BACKEND") or ("orjson" if "orjson" in BACKENDS else "json")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend '{name}', available: {', '.join(BACKENDS)}")
+    _backend = name
+    return name
+
+
+use_backend()
+
+
+def loads(raw):
+    """Parse the raw bytes of a JSON file with the selected backend."""
+    with phase("parse"):
+        json_data = BACKENDS[_backend][0](raw)
+    count("files_parsed")
+    return json_data
+
+
+def read_bytes(file_path):
+    """Read a whole file, counting it in the run metrics."""
+    with phase("read"):
+        with open(file_path, "rb") as f:
+            raw = f.read()
+    count("files_read")
+    count("bytes_read", len(raw))
+    return raw
+
+
+def read_json(file_path):
+    """Load a JSON file, returning (json_data, raw bytes as read from disk)."""
+    raw = read_bytes(file_path)
+    return loads(raw), raw
+
+
+def dump_json(json_data):
+    """Serialize json_data to the bytes the scripts have always written.
+
+    That is json.dump(..., indent=2) through a UTF-8 text-mode file, so line
+    endings follow the platform the same way they did before. The selected
+    backend produces the text; whatever it can't reproduce goes through json.
+    """
+    text = BACKENDS[_backend][1](json_data)
+    if text is None:
+        text = _stdlib_dumps(json_data)
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    return text.encode("utf-8")
+
+
+def write_atomic(file_path, data):
+    """Replace file_path with data via a temp file in the same directory and a rename."""
+    file_path = os.fspath(file_path)
+    directory = os.path.dirname(file_path) or "."
+    with phase("write"):
+        fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(file_path):
+                shutil.copymode(file_path, tmp_path)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+    count("files_written")
+    count("bytes_written", len(data))
+
+
+def _find_spans(text, idx, trie, spans):
+    """Record in spans the (start, end) of every value under text[idx] that trie addresses.
+
+    trie maps pointer tokens to sub-tries; a None entry marks where a pointer
+    ends. Everything else is skipped with json's scanner. Returns the end of
+    the value at idx.
+    """
+    idx = _WHITESPACE.match(text, idx).end()
+    pointer = trie.get(None)
+    if pointer is not None:
+        _, end = _scan_value(text, idx)
+        spans[pointer] = (idx, end)
+        return end
+    if text.startswith("{", idx):
+        idx = _WHITESPACE.match(text, idx + 1).end()
+        while not text.startswith("}", idx):
+            key, idx = json.decoder.scanstring(text, idx + 1)
+            idx = _WHITESPACE.match(text, idx).end() + 1  # the ':'
+            if key in trie:
+                idx = _find_spans(text, idx, trie[key], spans)
+            else:
+                _, idx = _scan_value(text, _WHITESPACE.match(text, idx).end())
+            idx = _WHITESPACE.match(text, idx).end()
+            if text.startswith(",", idx):
+                idx = _WHITESPACE.match(text, idx + 1).end()
+        return idx + 1
+    if text.startswith("[", idx):
+        idx = _WHITESPACE.match(text, idx + 1).end()
+        position = 0
+        while not text.startswith("]", idx):
+            sub = trie.get(str(position))
+            if sub is not None:
+                idx = _find_spans(text, idx, sub, spans)
+            else:
+                _, idx = _scan_value(text, idx)
+            idx = _WHITESPACE.match(text, idx).end()
+            if text.startswith(",", idx):
+                idx = _WHITESPACE.match(text, idx + 1).end()
+            position += 1
+        return idx + 1
+    _, end = _scan_value(text, idx)
+    return end
+
+
+def splice_json(original, edits, json_data):
+    """Apply scalar "replace" edits to the original bytes in place, keeping everything else.
+
+    Only the replaced values change, so hand formatting, key order and line
+    endings survive and a one-value edit is a one-line diff. Returns None when
+    that isn't possible - any add/remove, a container value, a file that
+    doesn't parse back to json_data - and the document has to be serialized.
+    """
+    final = {}
+    for op, pointer, old, new in edits:
+        if op != "replace" or not isinstance(new, _SCALARS):
+            return None
+        if pointer not in final:
+            if not isinstance(old, _SCALARS):
+                return None
+            final[pointer] = [old, new]
+        else:
+            final[pointer][1] = new
+
+    trie = {}
+    for pointer in final:
+        if not pointer:
+            return None
+        node = trie
+        for token in pointer.split("/")[1:]:
+            node = node.setdefault(unescape_token(token), {})
+            if None in node:
+                return None
+        if node:
+            return None
+        node[None] = pointer
+
+    try:
+        text = original.decode("utf-8")
+        spans = {}
+        _find_spans(text, 0, trie, spans)
+    except (UnicodeDecodeError, ValueError, StopIteration, IndexError):
+        return None
+    if len(spans) != len(final):
+        return None
+
+    parts = []
+    end = 0
+    for pointer, (start, stop) in sorted(spans.items(), key=lambda item: item[1]):
+        old, new = final[pointer]
+        current = _scan_value(text, start)[0]
+        if type(current) is not type(old) or current != old:
+            return None
+        parts.append(text[end:start])
+        parts.append(json.dumps(new))
+        end = stop
+    parts.append(text[end:])
+    data = "".join(parts).encode("utf-8")
+    # duplicate keys or anything else unexpected: serialize instead
+    try:
+        if BACKENDS[_backend][0](data) != json_data:
+            return None
+    except ValueError:
+        return None
+    return data
+
+
+def write_json(file_path, json_data, original=None, journal=None, edits=None):
+    """Write json_data unless it serializes to exactly the bytes already on disk.
+
+    original is the raw content read_json returned; when it's omitted the file
+    is read again for the comparison. When edits only replace scalar values
+    they are spliced into the original bytes (see splice_json) instead of
+    re-serializing the document. If the file is written and a journal is given,
+    the before/after hashes and edits are recorded in it (see journal.py).
+    Returns CHANGED or UNCHANGED.
+    """
+    if original is None:
+        try:
+            original = read_bytes(file_path)
+        except OSError:
+            original = None
+    with phase("serialize"):
+        data = None
+        if original is not None and edits:
+            data = splice_json(original, edits, json_data)
+        if data is None:
+            data = dump_json(json_data)
+    if original == data:
+        return UNCHANGED
+    write_atomic(file_path, data)
+    if journal is not None:
+        journal.record(file_path, content_hash(original) if original is not None else None,
+                       content_hash(data), edits)
+    return CHANGED
@@ -1,73 +1,49 @@
 from pathlib import Path
 import re
-import json
-from jsonpath_ng import parse
-import pandas as pd
 import argparse
-
-def get_paths(d, prefix=""):
-    """Recursively yield JSONPath-like paths from JSON data."""
-    if isinstance(d, dict):
-        for key, value in d.items():
-            new_prefix = f"{prefix}.{key}" if prefix else f".{key}"
-            yield new_prefix
-            yield from get_paths(value, new_prefix)
-    elif isinstance(d, list):
-        for i, value in enumerate(d):
-            new_prefix = f"{prefix}[{i}]"
-            yield new_prefix
-            yield from get_paths(value, new_prefix)
-
-def find_best_match_segments(keyword_segments, all_paths):
-    """Finds the JSON path with the highest number of matching leading segments."""
-    best_match = None
-    best_score = 0
-    for path in all_paths:
-        path_segments = [p for p in path.strip('.').split('.') if p]
-        score = 0
-        for seg in keyword_segments[:-1]:
-            if seg in path_segments:
-                score += 1
-        if score > best_score:
-            best_score = score
-            best_match = path
-    return best_match, best_score
-
-def set_value_in_path(json_obj, path_list, value):
-    """Create intermediate keys if missing and set value at final key."""
-    for key in path_list[:-1]:
-        if key not in json_obj or not isinstance(json_obj[key], dict):
-            json_obj[key] = {}
-        json_obj = json_obj[key]
-    json_obj[path_list[-1]] = value
-
-def create_nested_structure(json_data, path_parts, value):
-    """Creates nested dictionary structure for a given path if it doesn't exist"""
-    current = json_data
-    for part in path_parts[:-1]:
-        if part not in current:
-            current[part] = {}
-        elif not isinstance(current[part], dict):
-            current[part] = {}
-        current = current[part]
-    current[path_parts[-1]] = value
-    return json_data
-
-def _is_blank_cell(cell_value):
-    """Return True if the excel cell is empty/NaN/blank after stripping."""
-    if pd.isna(cell_value):
-        return True
-    s = str(cell_value).strip()
-    return s == "" or s.lower() == "nan"
-
-def process_file(file_path, row, columns, folder_pattern="*"):
-    """Process a single JSON file with Excel data. Create/update when Excel has value.
-       Remove key if Excel cell is blank."""
+import csv
+from collections import Counter
+from functools import partial
+
+from device_index import DeviceIndex
+from json_io import CHANGED, UNCHANGED, read_json, write_json
+from json_index import PathIndex
+from journal import DEFAULT_JOURNAL_DIR, Journal
+from metrics import add_arguments, count, instrumented, phase
+from patches import PatchWriter
+from pipeline import run_jobs
+from register import REGISTER_COLUMNS, normalize_values, read_register
+from shard import add_shard_argument, in_shard, shard_path
+
+# process_file outcomes besides json_io's CHANGED / UNCHANGED
+SKIPPED = "skipped"
+ERROR = "error"
+
+def find_best_match_segments(keyword_segments, index):
+    """Finds the JSON path with the highest number of matching leading segments.
+       Scores come from the PathIndex's segment -> nodes index, so only paths sharing a
+       segment with the keyword are looked at; ties go to the first path in document order."""
+    segments = index.segments()
+    scores = Counter()
+    for seg in keyword_segments[:-1]:
+        scores.update(segments.get(seg, ()))
+    if not scores:
+        return None, 0
+    best_score = max(scores.values())
+    best_match = min((node for node, score in scores.items() if score == best_score), key=lambda n: n.order)
+    return best_match.path, best_score
+
+def process_file(file_path, row, columns, folder_pattern="*", patch_writer=None, journal=None):
+    """Process a single JSON file with a normalized register row (see register.read_register).
+       Create/update when the row has a value, remove the key when it is None (blank cell).
+       With a patch_writer (dry run) the edits are written as a JSON Patch instead of saving;
+       otherwise saved edits are recorded in the journal, if one is given.
+       Returns SKIPPED, UNCHANGED, CHANGED or ERROR."""
     try:
-        with file_path.open("r", encoding="utf-8") as f:
-            json_data = json.load(f)
+        json_data, original = read_json(file_path)
 
-        paths = list(get_paths(json_data))
+        with phase("index"):
+            index = PathIndex(json_data)
         changes_made = False
 
         for keyword in columns:
@@ -75,78 +51,55 @@ def process_file(file_path, row, columns, folder_pattern="*"):
             if not keyword:
                 continue
 
-            raw_cell = row.get(keyword, "")
-            if _is_blank_cell(raw_cell):
+            excel_value = row.get(keyword)
+            if excel_value is None:
                 # remove key from JSON if present
                 # find any exact matches that end with .<keyword>
-                exact_matches = [p for p in paths if p.lower().endswith("." + keyword.lower())]
-                if not exact_matches:
-                    # nothing to remove
-                    continue
-
-                for p in exact_matches:
-                    # parent path (without the trailing .keyword)
-                    if "." in p:
-                        parent_path = p.rsplit(".", 1)[0]  # keeps leading dot(s)
-                    else:
-                        parent_path = ""
+                for node in index.find_suffix(keyword):
+                    # an earlier match may have removed this one along with its parent
+                    if not node.attached:
+                        continue
+                    # only a key named like the whole column is removed, so a blank cell
+                    # of a dotted column (system.location.floor) leaves the file alone
+                    if str(node.key).lower() != keyword.lower():
+                        continue
+                    parent_path = node.parent.path
                     try:
-                        if parent_path == "" or parent_path == ".":
-                            parent_expr = parse("$")
-                        else:
-                            parent_expr = parse("$" + parent_path)
-                        parent_matches = parent_expr.find(json_data)
-                        for pm in parent_matches:
-                            if isinstance(pm.value, dict):
-                                # remove the key if present (case-sensitive as stored)
-                                # find actual key name in parent dict (match case-insensitive)
-                                keys_map = {k.lower(): k for k in pm.value.keys()}
-                                key_lower = keyword.lower()
-                                if key_lower in keys_map:
-                                    real_key = keys_map[key_lower]
-                                    del pm.value[real_key]
-                                    changes_made = True
-                                    print(f"🗑 Removed '{real_key}' from {parent_path or '$'} in {file_path}")
+                        if isinstance(index.container(node), dict):
+                            index.delete(node)
+                            changes_made = True
+                            print(f"🗑 Removed '{node.key}' from {parent_path or '$'} in {file_path}")
                     except Exception as e:
                         print(f"❌ Error removing {keyword} in {file_path}: {e}")
                 continue  # proceed next column
 
-            # non-blank cell -> sanitize and set/create/update
-            excel_value = str(raw_cell).strip()
-            if '&' in excel_value:
-                excel_value = excel_value.replace(' ', '').replace('&', '-')
-            elif '/' in excel_value:
-                excel_value = excel_value.replace(' ', '').replace('/', '-')
-            elif ' ' in excel_value:
-                excel_value = excel_value.replace(' ', '-')
-
+            # non-blank cell (already sanitized) -> set/create/update
             keyword_segments = [seg for seg in keyword.split('.') if seg]
 
             try:
                 # Try exact path match first
-                exact_matches = [p for p in paths if p.lower().endswith("." + keyword.lower())]
+                exact_matches = index.find_suffix(keyword)
                 if exact_matches:
-                    path_expr = parse("$" + exact_matches[0])
-                    path_expr.update(json_data, excel_value)
-                    changes_made = True
-                    print(f"✅ Updated existing: {keyword} → {excel_value}  ({file_path})")
+                    if index.set_value(exact_matches[0], excel_value):
+                        changes_made = True
+                        print(f"✅ Updated existing: {keyword} → {excel_value}  ({file_path})")
                     continue
 
                 # If full dotted path provided, create nested structure
                 if '.' in keyword and len(keyword_segments) > 0:
-                    create_nested_structure(json_data, keyword_segments, excel_value)
-                    changes_made = True
-                    print(f"✅ Created new nested path: {keyword} → {excel_value}  ({file_path})")
+                    if index.set_nested(keyword_segments, excel_value):
+                        changes_made = True
+                        print(f"✅ Created new nested path: {keyword} → {excel_value}  ({file_path})")
                     continue
 
                 # Fallback: find best parent match and insert under it
-                best_parent, score = find_best_match_segments(keyword_segments, paths)
+                best_parent, score = find_best_match_segments(keyword_segments, index)
                 if best_parent and score > 0:
                     parent_segments = [s for s in best_parent.strip('.').split('.') if s]
                     path_list = parent_segments + [keyword_segments[-1]]
-                    set_value_in_path(json_data, path_list, excel_value)
-                    changes_made = True
-                    print(f"✅ Added via parent match: {'.'.join(path_list)} → {excel_value}  ({file_path})")
+                    if index.set_nested(path_list, excel_value):
+                        changes_made = True
+                        print(f"✅ Added via parent match: {'.'.join(path_list)} → {excel_value}  ({file_path})")
                 else:
                     print(f"❌ No suitable match found for '{keyword}', skipped. ({file_path})")
 
@@ -154,81 +107,185 @@ def process_file(file_path, row, columns, folder_pattern="*"):
                 print(f"❌ Error processing {keyword} in {file_path}: {str(e)}")
                 continue
 
-        if changes_made:
-            with file_path.open("w", encoding="utf-8") as fw:
-                json.dump(json_data, fw, indent=2)
-            print(f"✅ Saved changes to {file_path}")
+        if not changes_made:
+            return SKIPPED
+        if patch_writer is not None:
+            patch_writer.write(file_path, index.edits)
+            return CHANGED
+        if write_json(file_path, json_data, original, journal, index.edits) == UNCHANGED:
+            return UNCHANGED
+        count("files_modified")
+        print(f"✅ Saved changes to {file_path}")
+        return CHANGED
 
     except Exception as e:
         print(f"❌ Error processing file {file_path}: {str(e)}")
-
-def process_single_update(key, value, search_root, target_filename, folder_pattern="*"):
-    """Process single key-value update across all matching files. If value is blank, remove key(s)."""
-    matched_files = list(search_root.rglob(target_filename))
-    for file in matched_files:
-        if folder_pattern != "*" and not file.parent.match(folder_pattern):
-            continue
-
-        try:
-            with file.open("r", encoding="utf-8") as f:
-                json_data = json.load(f)
-
-            paths = list(get_paths(json_data))
-            keyword_segments = [seg for seg in key.split('.') if seg]
-            changes_made = False
-
-            if _is_blank_cell(value):
-                # remove any matching keys
-                exact_matches = [p for p in paths if p.lower().endswith("." + key.lower())]
-                for p in exact_matches:
-                    parent_path = p.rsplit(".", 1)[0] if "." in p else ""
-                    try:
-                        parent_expr = parse("$" + parent_path) if parent_path and parent_path != "." else parse("$")
-                        parent_matches = parent_expr.find(json_data)
-                        for pm in parent_matches:
-                            if isinstance(pm.value, dict):
-                                keys_map = {k.lower(): k for k in pm.value.keys()}
-                                kl = key.lower().split('.')[-1]
-                                if kl in keys_map:
-                                    del pm.value[keys_map[kl]]
-                                    changes_made = True
-                                    print(f"🗑 Removed '{keys_map[kl]}' from {parent_path or '$'} in {file}")
-                    except Exception as e:
-                        print(f"❌ Error removing {key} in {file}: {e}")
-            else:
-                # sanitize provided value
-                val = str(value).strip()
-                if '&' in val:
-                    val = val.replace(' ', '').replace('&', '-')
-                elif '/' in val:
-                    val = val.replace(' ', '').replace('/', '-')
-                elif ' ' in val:
-                    val = val.replace(' ', '-')
-
-                # Try exact path match first
-                exact_matches = [p for p in paths if p.lower().endswith("." + key.lower())]
-                if exact_matches:
-                    path_expr = parse("$" + exact_matches[0])
-                    path_expr.update(json_data, val)
-                    changes_made = True
-                elif '.' in key and len(keyword_segments) > 0:
-                    create_nested_structure(json_data, keyword_segments, val)
+        return ERROR
+
+def apply_param(index, key, val, file):
+    """Apply one already sanitized key/value update to an indexed file; remove the key(s) if val is None.
+       Returns True if the document changed."""
+    keyword_segments = [seg for seg in key.split('.') if seg]
+    changes_made = False
+
+    if val is None:
+        # remove any matching keys
+        for node in index.find_suffix(key):
+            if not node.attached:
+                continue
+            parent_path = node.parent.path
+            try:
+                if isinstance(index.container(node), dict):
+                    index.delete(node)
                     changes_made = True
-                else:
-                    best_parent, score = find_best_match_segments(keyword_segments, paths)
-                    if best_parent and score > 0:
-                        parent_segments = [s for s in best_parent.strip('.').split('.') if s]
-                        path_list = parent_segments + [keyword_segments[-1]]
-                        set_value_in_path(json_data, path_list, val)
-                        changes_made = True
+                    print(f"🗑 Removed '{node.key}' from {parent_path or '$'} in {file}")
+            except Exception as e:
+                print(f"❌ Error removing {key} in {file}: {e}")
+    else:
+        # Try exact path match first
+        exact_matches = index.find_suffix(key)
+        if exact_matches:
+            changes_made = index.set_value(exact_matches[0], val)
+        elif '.' in key and len(keyword_segments) > 0:
+            changes_made = index.set_nested(keyword_segments, val)
+        else:
+            best_parent, score = find_best_match_segments(keyword_segments, index)
+            if best_parent and score > 0:
+                parent_segments = [s for s in best_parent.strip('.').split('.') if s]
+                path_list = parent_segments + [keyword_segments[-1]]
+                changes_made = index.set_nested(path_list, val)
+    return changes_made
+
+def process_param_file(file, updates, patch_writer=None, journal=None):
+    """Apply a list of already sanitized (key, value) updates to a single file, in order, with one
+       read and at most one write. Returns SKIPPED, UNCHANGED, CHANGED or ERROR, like process_file."""
+    try:
+        json_data, original = read_json(file)
 
-            if changes_made:
-                with file.open("w", encoding="utf-8") as fw:
-                    json.dump(json_data, fw, indent=2)
-                print(f"✅ Updated {key} in {file}")
+        with phase("index"):
+            index = PathIndex(json_data)
+        updated = []
+        for key, val in updates:
+            try:
+                if apply_param(index, key, val, file):
+                    updated.append(key)
+            except Exception as e:
+                print(f"❌ Error processing {key} in {file}: {str(e)}")
+
+        if not updated:
+            return SKIPPED
+        if patch_writer is not None:
+            patch_writer.write(file, index.edits)
+            return CHANGED
+        if write_json(file, json_data, original, journal, index.edits) == UNCHANGED:
+            return UNCHANGED
+        count("files_modified")
+        print(f"✅ Updated {', '.join(dict.fromkeys(updated))} in {file}")
+        return CHANGED
 
-        except Exception as e:
-            print(f"❌ Error processing {file}: {str(e)}")
+    except Exception as e:
+        print(f"❌ Error processing {file}: {str(e)}")
+        return ERROR
+
+def read_param_pairs(pairs_file):
+    """Read KEY/VALUE pairs from a .json file ({"key": value, ...} or [[key, value], ...])
+       or a two-column CSV file (an optional 'key,value' header row is skipped; quote values holding
+       a comma). JSON values must be strings, numbers or null (a blank, i.e. remove the key).
+       Raises ValueError for anything that isn't a KEY/VALUE pair."""
+    pairs_file = Path(pairs_file)
+    if pairs_file.suffix.lower() == ".json":
+        data, _ = read_json(pairs_file)
+        if isinstance(data, dict):
+            pairs = list(data.items())
+        elif isinstance(data, list):
+            pairs = data
+        else:
+            raise ValueError("expected an object or a list of [key, value] pairs")
+        for pair in pairs:
+            if not isinstance(pair, (list, tuple)) or len(pair) != 2:
+                raise ValueError(f"not a KEY/VALUE pair: {pair!r}")
+            value = pair[1]
+            # bools, lists and objects would be written as their Python repr
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (str, int, float))):
+                raise ValueError(f"value for {pair[0]!r} must be a string, number or null, not {value!r}")
+        pairs = [tuple(pair) for pair in pairs]
+    else:
+        with open(pairs_file, "r", encoding="utf-8-sig", newline="") as f:
+            rows = [row for row in csv.reader(f) if any(cell.strip() for cell in row)]
+        if rows and [cell.strip().lower() for cell in rows[0]] == ["key", "value"]:
+            rows = rows[1:]
+        # a row with more cells is most likely a value with an unquoted comma; don't cut it short
+        pairs = [tuple(row) for row in rows]
+    for pair in pairs:
+        if len(pair) != 2 or not isinstance(pair[0], str):
+            raise ValueError(f"not a KEY/VALUE pair: {pair!r}")
+    return [(key.strip(), value) for key, value in pairs]
+
+def process_param_updates(pairs, search_root, target_filename, folder_pattern="*", device_index=None,
+                          patch_writer=None, journal=None, concurrency=1, shard=None):
+    """Process key-value updates across all matching files in a single pass. A blank value removes the key(s).
+       Every file is read once, gets all pairs applied in the given order (a later pair for the same
+       key wins) and is written at most once.
+       With a patch_writer (dry run) the edits are written as JSON Patches instead of saving;
+       otherwise saved edits are recorded in the journal, if one is given.
+       Up to concurrency files are processed at once (see pipeline.run_jobs).
+       With a shard (i, N) only the device folders of that shard are updated, see shard.py.
+       Returns a Counter of per-file outcomes (see process_file)."""
+    if device_index is not None:
+        matched_files = device_index.all_files()
+    else:
+        matched_files = search_root.rglob(target_filename)
+    # sanitize the values once, the same way register cells are
+    updates = list(zip([key for key, _ in pairs], normalize_values([value for _, value in pairs])))
+    jobs = ((file, partial(process_param_file, file, updates, patch_writer, journal))
+            for file in matched_files
+            if (folder_pattern == "*" or file.parent.match(folder_pattern)) and in_shard(file, search_root, shard))
+    return run_jobs(jobs, concurrency)
+
+def register_jobs(input_file, columns, device_index, folder_pattern="*", register_cache=None,
+                  patch_writer=None, journal=None, shard=None):
+    """Yield one (file, process_file job) pair per metadata file the register's devices resolve to.
+       The whole register is read and its rows grouped by file first, so a file is read and written
+       once however many rows name its device. Rows are merged in register order, the last row's
+       cell winning for every column; columns that rows disagree on are reported as conflicts.
+       With a shard (i, N) only the device folders of that shard are updated, see shard.py."""
+    merged = {}
+    conflicts = []
+    for row in read_register(input_file, cache_dir=register_cache):
+        device = row['Devices']
+        if not device:
+            continue
+
+        with phase("discover"):
+            files = device_index.files(device)
+        for file in files:
+            if folder_pattern != "*" and not file.parent.match(folder_pattern):
+                continue
+            if not in_shard(file, device_index.root, shard):
+                continue
+            current = merged.get(file)
+            if current is None:
+                merged[file] = dict(row)
+                continue
+            for keyword in columns:
+                if current.get(keyword) != row.get(keyword):
+                    conflicts.append((file, keyword, current.get(keyword), row.get(keyword)))
+            current.update(row)
+
+    count("files_discovered", len(merged))
+    if conflicts:
+        count("register_conflicts", len(conflicts))
+        print(f"⚠️ {len(conflicts)} conflicting register values, the last row wins:")
+        for file, keyword, old, new in conflicts:
+            print(f"   {keyword}: {old!r} → {new!r}  ({file})")
+
+    for file, row in merged.items():
+        yield file, partial(process_file, file, row, columns, patch_writer=patch_writer, journal=journal)
+
+def print_outcomes(outcomes):
+    """Summarize how many files were changed, left as they were, or failed."""
+    print(f"\n📊 Files changed: {outcomes[CHANGED]}, unchanged after re-serializing: {outcomes[UNCHANGED]}, "
+          f"no edits needed: {outcomes[SKIPPED]}, errors: {outcomes[ERROR]}")
 
 def main():
     parser = argparse.ArgumentParser(
@@ -237,12 +294,16 @@ def main():
 
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument('-i', '--input',
-                       default="Appendix 6 - _IN-BLR-ANANTA_ Digital Building Device Register v2.0 Chubb [go_bos-app6].xlsx",
-                       help='Input Excel file path')
+                       help='Input Excel file path (e.g., "Appendix 6 - _IN-BLR-ANANTA_ Digital Building '
+                            'Device Register v2.0 Chubb [go_bos-app6].xlsx")')
     group.add_argument('-p', '--param',
                        nargs=2,
+                       action='append',
                        metavar=('KEY', 'VALUE'),
-                       help='Key and value to update (e.g., "system.location.x" "10")')
+                       help='Key and value to update (e.g., "system.location.x" "10"); '
+                            'repeat to apply several pairs in one pass')
+    group.add_argument('--params-file',
+                       help='CSV (key,value) or JSON file of key/value pairs to apply in one pass')
 
     parser.add_argument('--root',
                         default="E:/temp_projects/json_values_checker/devices/",
@@ -253,44 +314,69 @@ def main():
     parser.add_argument('--pattern',
                         default="*",
                         help='Folder name pattern to match (e.g., "EM-*")')
-
+    parser.add_argument('--index-cache',
+                        default=".device_index.json",
+                        help='Cache file for the device directory index ("" to disable)')
+    parser.add_argument('--register-cache',
+                        default=".register_cache",
+                        help='Directory for parsed copies of the register workbook ("" to disable)')
+    parser.add_argument('--dry-run',
+                        action='store_true',
+                        help='Do not modify any file; write the edits as JSON Patches to --patch-file')
+    parser.add_argument('--patch-file',
+                        default="dry_run_patches.jsonl",
+                        help='JSONL output for --dry-run, one {"file", "patch"} object per file')
+    parser.add_argument('--concurrency',
+                        type=int,
+                        default=1,
+                        help='Number of files read/updated/written at once (default: 1, serial)')
+    parser.add_argument('--journal-dir',
+                        default=DEFAULT_JOURNAL_DIR,
+                        help='Directory for the undo journal of changed files ("" to disable)')
+    add_shard_argument(parser)
+
+    add_arguments(parser)
     args = parser.parse_args()
 
-    search_root = Path(args.root)
-    if not search_root.exists():
-        print(f"❌ Root directory not found: {search_root}")
-        return
-
-    if args.input:
-        if not Path(args.input).exists():
-            print(f"❌ Input file not found: {args.input}")
+    with instrumented(args.metrics, args.profile):
+        search_root = Path(args.root)
+        if not search_root.exists():
+            print(f"❌ Root directory not found: {search_root}")
             return
 
-        df = pd.read_excel(args.input, sheet_name='4-All Devices', engine='openpyxl', skiprows=3).fillna("")
-        df = df[['Device/Asset role name (asset.name)', 'Floor','Location','Panel Reference']]
-        df.rename(columns={'Device/Asset role name (asset.name)': 'Devices',
-                   'Floor': 'system.location.floor' ,
-                   'Location': 'system.location.section',
-                   'Panel Reference': 'system.location.panel'}, inplace=True)
-        columns = [col for col in df.columns if col != 'Devices']
-
-        for idx, row in df.iterrows():
-            device = str(row['Devices']).strip()
-            if not device:
-                continue
+        with phase("discover"):
+            device_index = DeviceIndex(search_root, args.filename, args.index_cache or None)
+        print(f"📂 Indexed {len(device_index.devices)} devices "
+              f"({device_index.scanned} directories scanned, {device_index.reused} from cache)")
 
-            root_dir = search_root / device
-            matched_files = list(root_dir.rglob(args.filename))
+        for input_file in (args.input, args.params_file):
+            if input_file and not Path(input_file).exists():
+                print(f"❌ Input file not found: {input_file}")
+                return
 
-            if matched_files:
-                for file in matched_files:
-                    if args.pattern != "*" and not file.parent.match(args.pattern):
-                        continue
-                    process_file(file, row, columns)
+        patch_writer = PatchWriter(shard_path(args.patch_file, args.shard)) if args.dry_run else None
+        journal = Journal(args.journal_dir) if args.journal_dir and not args.dry_run else None
 
-    elif args.param:
-        key, value = args.param
-        process_single_update(key, value, search_root, args.filename, args.pattern)
+        if args.input:
+            columns = [col for col in REGISTER_COLUMNS.values() if col != 'Devices']
+            jobs = register_jobs(args.input, columns, device_index, args.pattern, args.register_cache or None,
+                                 patch_writer, journal, args.shard)
+            outcomes = run_jobs(jobs, args.concurrency)
+
+        else:
+            try:
+                pairs = args.param or read_param_pairs(args.params_file)
+            except (OSError, ValueError) as e:
+                print(f"❌ Could not read key/value pairs from {args.params_file}: {e}")
+                return
+            outcomes = process_param_updates(pairs, search_root, args.filename, args.pattern, device_index,
+                                             patch_writer, journal, args.concurrency, args.shard)
+
+        if patch_writer is not None:
+            patch_writer.close()
+        if journal is not None:
+            journal.close()
+        print_outcomes(outcomes)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from metrics import count
+
+MANIFEST_VERSION = 1
+
+
+def rules_hash(rules, mode):
+    """Hash a rule set (and its match mode) so results are only reused for the same rules."""
+    items = rules.rules if hasattr(rules, "rules") else list(rules.items())
+    modes = getattr(rules, "modes", [])
+    if any(rule_mode != mode for rule_mode in modes):
+        payload = json.dumps([mode, items, modes], ensure_ascii=True)
+    else:
+        payload = json.dumps([mode, items], ensure_ascii=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def content_hash(content):
+    """Hash the raw bytes of a metadata file."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class Manifest:
+    """Per-file record of (size, mtime, content hash, last stats) from previous unit-check runs.
+
+    A file whose size and mtime are unchanged is not read again; one whose
+    mtime moved but whose content hash is the same (touched, re-checked out)
+    is read but not re-validated. Everything is discarded when the rules change.
+    """
+
+    def __init__(self, manifest_file, rules_digest, full=False):
+        self.manifest_file = Path(manifest_file) if manifest_file else None
+        self.rules_digest = rules_digest
+        self.entries = {}
+        self.reused = 0
+        if self.manifest_file and not full and self.manifest_file.exists():
+            try:
+                with self.manifest_file.open("r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION and data.get("rules") == rules_digest:
+                    self.entries = data.get("files", {})
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable manifest {self.manifest_file}: {e}")
+
+    def lookup(self, file_path):
+        """Return the stored stats for file_path if it hasn't changed since they were recorded."""
+        entry = self.entries.get(str(file_path))
+        if entry is None:
+            return None
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        if st.st_size != entry["size"]:
+            return None
+        if st.st_mtime_ns != entry["mtime"]:
+            try:
+                digest = content_hash(Path(file_path).read_bytes())
+            except OSError:
+                return None
+            if digest != entry["sha256"]:
+                return None
+            entry["mtime"] = st.st_mtime_ns
+        self.reused += 1
+        count("files_reused")
+        return entry["stats"]
+
+    def record(self, file_path, st, digest, stats):
+        """Remember the stats for file_path as read with stat result st and content hash digest."""
+        self.entries[str(file_path)] = {
+            "size": st.st_size,
+            "mtime": st.st_mtime_ns,
+            "sha256": digest,
+            "stats": stats,
+        }
+
+    def forget(self, file_path):
+        self.entries.pop(str(file_path), None)
+
+    def save(self):
+        if not self.manifest_file:
+            return
+        tmp_file = self.manifest_file.with_name(self.manifest_file.name + ".tmp")
+        with tmp_file.open("w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "rules": self.rules_digest, "files": self.entries}, f)
+        os.replace(tmp_file, self.manifest_file)
@@ -0,0 +1,31 @@
+from pathlib import Path
+import argparse
+import glob
+
+from report import merge_reports, print_summary
+
+# CONFIGURATION
+output_file = Path("E:/temp_projects/json_values_checker/unit_check_report.txt")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Merge the reports of a run split with --shard i/N into the report of a single run'
+    )
+    parser.add_argument('reports', nargs='+',
+                        help='JSONL report of every shard (patterns like "unit_check_report.shard-*.jsonl" work '
+                             'on shells that do not expand them)')
+    parser.add_argument('-o', '--output', default=str(output_file),
+                        help='Merged text report; the .jsonl and .csv files are written next to it')
+    args = parser.parse_args()
+
+    jsonl_files = []
+    for pattern in args.reports:
+        jsonl_files.extend(sorted(glob.glob(pattern)) or [pattern])
+
+    try:
+        summary = merge_reports(jsonl_files, args.output)
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not merge reports: {e}")
+    else:
+        print_summary(summary)
+        print(f"\n📝 Merged {len(jsonl_files)} shard reports into: {args.output}")
@@ -0,0 +1,93 @@
+import cProfile
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class RunMetrics:
+    """Wall time per phase and named counters for one run of a script.
+
+    Phases add up the time spent in them, across threads too, so with a
+    concurrent run they can exceed the wall time of the whole run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def export(self):
+        """Phases and counters as plain dicts, e.g. to send back from a worker process."""
+        with self._lock:
+            return {"phases": dict(self.phases), "counters": dict(self.counters)}
+
+    def merge(self, exported):
+        """Add the phases and counters exported by another process."""
+        for name, seconds in exported["phases"].items():
+            self.add_time(name, seconds)
+        for name, n in exported["counters"].items():
+            self.count(name, n)
+
+    def summary(self):
+        exported = self.export()
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 6),
+            "phases": {name: round(seconds, 6) for name, seconds in exported["phases"].items()},
+            "counters": exported["counters"],
+        }
+
+
+# the metrics of this process' run, recorded by the shared helper modules
+METRICS = RunMetrics()
+phase = METRICS.phase
+count = METRICS.count
+
+
+def add_arguments(parser):
+    """Add the --metrics and --profile options every entry point takes."""
+    parser.add_argument('--metrics', default=None,
+                        help='Also write the per-phase timings and counters as JSON to this file')
+    parser.add_argument('--profile', default=None,
+                        help='Run under cProfile and dump the stats to this file (see python -m pstats)')
+
+
+@contextmanager
+def instrumented(metrics_file=None, profile_file=None):
+    """Time a run, optionally under cProfile, and emit the JSON summary when it ends."""
+    METRICS.reset()
+    profiler = cProfile.Profile() if profile_file else None
+    if profiler:
+        profiler.enable()
+    try:
+        yield METRICS
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_file)
+            print(f"🔬 Profile saved to: {profile_file}")
+        summary = METRICS.summary()
+        print(f"📈 Run metrics: {json.dumps(summary)}")
+        if metrics_file:
+            with open(metrics_file, "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
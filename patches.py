@@ -0,0 +1,126 @@
+import copy
+import json
+import threading
+
+# An edit is (op, pointer, old, new): op is "add", "replace" or "remove", pointer
+# a JSON Pointer (RFC 6901), old the value it replaced/removed (None for "add")
+# and new the value written. For "remove" new is the position the key had in its
+# dict, so an undo can put it back there (None: a list item, or unknown).
+
+
+def escape_token(token):
+    """Escape one reference token for a JSON Pointer."""
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def pointer_from_keys(keys):
+    """Build a JSON Pointer from a sequence of dict keys / list indices."""
+    return "".join("/" + escape_token(k) for k in keys)
+
+
+def unescape_token(token):
+    """Undo escape_token."""
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def resolve_pointer(doc, pointer):
+    """Return (container, key) addressed by a JSON Pointer."""
+    tokens = [unescape_token(t) for t in pointer.split("/")[1:]]
+    container = doc
+    for token in tokens[:-1]:
+        container = container[int(token)] if isinstance(container, list) else container[token]
+    key = tokens[-1]
+    return container, int(key) if isinstance(container, list) else key
+
+
+def revert_edits(doc, edits):
+    """Undo recorded edits on doc, last edit first."""
+    for op, pointer, old, new in reversed(edits):
+        container, key = resolve_pointer(doc, pointer)
+        if op == "add":
+            del container[key]
+        elif op == "remove" and isinstance(container, list):
+            container.insert(key, old)
+        elif op == "remove" and new is not None:
+            # re-insert the key where it was, so the file serializes as it did before
+            items = list(container.items())
+            items.insert(new, (key, old))
+            container.clear()
+            container.update(items)
+        else:
+            container[key] = old
+    return doc
+
+
+def invert_edits(edits):
+    """Edits that undo edits, in the order they have to be applied."""
+    inverted = []
+    for op, pointer, old, new in reversed(edits):
+        if op == "add":
+            # an added key went last in its dict, which is where adding it back puts it
+            inverted.append(("remove", pointer, new, None))
+        elif op == "remove":
+            inverted.append(("add", pointer, None, old))
+        else:
+            inverted.append(("replace", pointer, new, old))
+    return inverted
+
+
+def snapshot(value):
+    """Copy containers so a recorded edit doesn't change when the document is edited later."""
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+def to_patch(edits):
+    """Turn recorded edits into an RFC 6902 JSON Patch (a list of operations)."""
+    patch = []
+    for op, pointer, _, new in edits:
+        if op == "remove":
+            patch.append({"op": "remove", "path": pointer})
+        else:
+            patch.append({"op": op, "path": pointer, "value": new})
+    return patch
+
+
+def unit_edits(corrections):
+    """Edits for (path, pointer, node, unit) unit corrections, as made by setting node['units'] = unit."""
+    edits = []
+    current = {}
+    for _, pointer, node, unit in corrections:
+        key = id(node)
+        if key not in current:
+            current[key] = ('units' in node, node.get('units'))
+        present, old = current[key]
+        op = "replace" if present else "add"
+        edits.append((op, pointer + "/units", old if present else None, unit))
+        current[key] = (True, unit)
+    return edits
+
+
+class PatchWriter:
+    """Stream one {"file": ..., "patch": [...]} JSON line per file to a dry-run output."""
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.files = 0
+        self.operations = 0
+        self._out = open(output_path, "w", encoding="utf-8")
+        # files may be processed in several threads (see pipeline.py)
+        self._lock = threading.Lock()
+
+    def write(self, file_path, edits):
+        if not edits:
+            return
+        patch = to_patch(edits)
+        line = json.dumps({"file": str(file_path), "patch": patch}) + "\n"
+        with self._lock:
+            self._out.write(line)
+            self._out.flush()
+            self.files += 1
+            self.operations += len(patch)
+
+    def close(self):
+        self._out.close()
+        print(f"📝 Dry run: {self.operations} operations for {self.files} files written to {self.output_path}")
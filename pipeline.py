@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from collections import Counter
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+
+_DONE = object()
+# how often a blocked discover thread looks whether the run was stopped
+_STOP_CHECK = 0.1
+
+
+async def _run_jobs(jobs, concurrency):
+    loop = asyncio.get_running_loop()
+    # one thread per job in flight, plus the discover thread
+    executor = ThreadPoolExecutor(max_workers=concurrency + 1)
+    loop.set_default_executor(executor)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    outcomes = Counter()
+    # file -> Event set when the latest job taken for it is done
+    latest = {}
+    # set when the run ends early (Ctrl+C, a failing job), so discover stops feeding the queue
+    stop = threading.Event()
+
+    def put(item):
+        """Put item on the queue, waiting while it is full; False if the run was stopped meanwhile."""
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=_STOP_CHECK)
+                return True
+            except futures.TimeoutError:
+                if stop.is_set():
+                    future.cancel()
+                    return False
+
+    def discover():
+        """Feed the queue from the jobs iterator; put() blocks while the queue is full."""
+        try:
+            for item in jobs:
+                if stop.is_set() or not put(item):
+                    return
+        finally:
+            if not stop.is_set():
+                for _ in range(concurrency):
+                    put(_DONE)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            file_path, job = item
+            # jobs are taken in queue order, so chaining on the previous job for
+            # the same file keeps its edits in the order they were queued
+            previous = latest.get(file_path)
+            done = latest[file_path] = asyncio.Event()
+            if previous is not None:
+                await previous.wait()
+            try:
+                outcomes[await loop.run_in_executor(None, job)] += 1
+            finally:
+                done.set()
+                if latest.get(file_path) is done:
+                    del latest[file_path]
+
+    try:
+        await asyncio.gather(loop.run_in_executor(None, discover), *(worker() for _ in range(concurrency)))
+    finally:
+        # on success this is a no-op; otherwise the workers are gone, so nothing
+        # may wait on the queue any more: stop discover and drop what it queued
+        stop.set()
+        while not queue.empty():
+            queue.get_nowait()
+        executor.shutdown(wait=False)
+    return outcomes
+
+
+def run_jobs(jobs, concurrency=1):
+    """Run (file_path, job) pairs, returning a Counter of what the jobs returned.
+
+    Each job is a callable doing the blocking read/apply/write for one file.
+    With concurrency > 1, up to that many jobs run at once in threads while
+    another thread keeps discovering jobs into a queue bounded at twice the
+    concurrency, so memory stays flat however many files there are. Jobs for
+    the same file still run one after another, in the order they came.
+    """
+    if concurrency <= 1:
+        outcomes = Counter()
+        for _, job in jobs:
+            outcomes[job()] += 1
+        return outcomes
+    return asyncio.run(_run_jobs(jobs, concurrency))
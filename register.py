@@ -0,0 +1,170 @@
+import hashlib
+import os
+import pickle
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from metrics import count, phase
+
+# Sheet and header layout of the Appendix 6 device register
+REGISTER_SHEET = '4-All Devices'
+REGISTER_SKIPROWS = 3
+# register column -> name used by the location updater
+REGISTER_COLUMNS = {
+    'Device/Asset role name (asset.name)': 'Devices',
+    'Floor': 'system.location.floor',
+    'Location': 'system.location.section',
+    'Panel Reference': 'system.location.panel',
+}
+
+
+def iter_register(input_file, sheet_name=REGISTER_SHEET, skiprows=REGISTER_SKIPROWS, columns=REGISTER_COLUMNS):
+    """Stream register rows as dicts holding only the mapped columns, renamed.
+
+    Uses openpyxl's read-only mode, so rows are produced as the sheet is read
+    instead of after the whole workbook is loaded. Empty cells come back as ""
+    and whole-number floats as ints, as pandas.read_excel(...).fillna("") gave.
+    """
+    wb = load_workbook(input_file, read_only=True, data_only=True)
+    try:
+        rows = wb[sheet_name].iter_rows(min_row=skiprows + 1, values_only=True)
+        header = next(rows, None) or ()
+        header = [str(h).strip() if h is not None else "" for h in header]
+        positions = []
+        for source, target in columns.items():
+            if source not in header:
+                raise KeyError(f"Column '{source}' not found in sheet '{sheet_name}'")
+            positions.append((target, header.index(source)))
+
+        for values in rows:
+            record = {}
+            for target, pos in positions:
+                value = values[pos] if pos < len(values) else None
+                if value is None:
+                    value = ""
+                elif isinstance(value, float) and value.is_integer():
+                    # Excel stores every number as a float; "163" should stay "163"
+                    value = int(value)
+                record[target] = value
+            yield record
+    finally:
+        wb.close()
+
+# bump when normalize_values changes so cached registers are rebuilt
+NORMALIZE_VERSION = 1
+# rows normalized together while streaming a workbook that isn't cached yet
+NORMALIZE_CHUNK = 2000
+
+
+def normalize_values(values):
+    """Sanitize a whole column of cell values at once.
+
+    Blank cells (empty, whitespace, NaN or the text "nan") become None, which
+    the updater treats as "remove this key". Other values are stripped and
+    have '&' / '/' (dropping spaces) or spaces turned into '-'.
+    """
+    series = pd.Series(list(values), dtype=object)
+    text = series.astype(str).str.strip()
+    blank = series.isna() | (text == "") | (text.str.lower() == "nan")
+
+    has_amp = text.str.contains("&", regex=False)
+    has_slash = ~has_amp & text.str.contains("/", regex=False)
+    has_space = ~has_amp & ~has_slash & text.str.contains(" ", regex=False)
+    if has_amp.any():
+        text[has_amp] = text[has_amp].str.replace(" ", "", regex=False).str.replace("&", "-", regex=False)
+    if has_slash.any():
+        text[has_slash] = text[has_slash].str.replace(" ", "", regex=False).str.replace("/", "-", regex=False)
+    if has_space.any():
+        text[has_space] = text[has_space].str.replace(" ", "-", regex=False)
+
+    return [None if is_blank else value for value, is_blank in zip(text.tolist(), blank.tolist())]
+
+
+def normalize_columns(data, key_column='Devices'):
+    """Normalize columnar register data in place: the key column is stripped, the rest sanitized."""
+    for name, values in data.items():
+        if name == key_column:
+            data[name] = [str(v).strip() for v in values]
+        else:
+            data[name] = normalize_values(values)
+    return data
+
+
+def _records(data):
+    names = list(data)
+    for values in zip(*data.values()):
+        yield dict(zip(names, values))
+
+
+def _register_cache_file(input_file, sheet_name, skiprows, columns, cache_dir):
+    """Cache file name for this workbook content and the way it is read."""
+    digest = hashlib.sha256()
+    with open(input_file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(repr((sheet_name, skiprows, list(columns.items()), NORMALIZE_VERSION)).encode("utf-8"))
+    return Path(cache_dir) / f"register-{digest.hexdigest()}.pickle"
+
+
+def read_register(input_file, sheet_name=REGISTER_SHEET, skiprows=REGISTER_SKIPROWS, columns=REGISTER_COLUMNS,
+                  cache_dir=None):
+    """Yield normalized register records, reusing a parsed copy cached on disk.
+
+    Records are the update table the location updater applies: 'Devices' is
+    the stripped device name and every other column is already sanitized, or
+    None for a blank cell (see normalize_values). Normalization runs column-wise
+    over chunks of rows, so a workbook is still streamed while it is parsed.
+
+    The cache is keyed by the workbook's content hash, the sheet name, skiprows
+    and the column mapping, and stores the normalized table column by column;
+    a repeat run against the same workbook skips Excel parsing entirely.
+    """
+    cache_file = None
+    if cache_dir:
+        cache_file = _register_cache_file(input_file, sheet_name, skiprows, columns, cache_dir)
+        if cache_file.exists():
+            try:
+                with phase("register"), cache_file.open("rb") as f:
+                    data = pickle.load(f)
+                count("register_rows", len(next(iter(data.values()), ())))
+                yield from _records(data)
+                return
+            except (OSError, pickle.UnpicklingError, EOFError) as e:
+                print(f"⚠️ Ignoring unreadable register cache {cache_file}: {e}")
+
+    data = {target: [] for target in columns.values()}
+    chunk = {target: [] for target in columns.values()}
+    rows = iter_register(input_file, sheet_name, skiprows, columns)
+    while True:
+        n = 0
+        with phase("register"):
+            for record in rows:
+                for target, value in record.items():
+                    chunk[target].append(value)
+                n += 1
+                if n == NORMALIZE_CHUNK:
+                    break
+        if not n:
+            break
+        count("register_rows", n)
+        with phase("normalize"):
+            normalize_columns(chunk)
+        yield from _records(chunk)
+        for target, values in chunk.items():
+            if cache_file is not None:
+                data[target].extend(values)
+            chunk[target] = []
+
+    if cache_file is None:
+        return
+    # only reached once the whole sheet has been read
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+        with tmp_file.open("wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"⚠️ Could not write register cache {cache_file}: {e}")
@@ -0,0 +1,201 @@
+import csv
+import heapq
+import json
+from pathlib import Path
+
+# devices listed in the end-of-run summary, most failures first
+WORST_DEVICES = 10
+CSV_FIELDS = ["file", "device", "keyword", "expected_unit", "pass", "fail"]
+
+
+class ReportWriter:
+    """Stream a unit-check report to disk while it is produced.
+
+    Writes the human-readable text report (same content as joining all lines
+    with newlines at the end used to give), plus a JSONL file with one record
+    per checked file and a CSV file with one row per file and rule, next to
+    it. Per-rule totals and the worst devices are kept as it goes and
+    appended to the JSONL file as a final {"summary": ...} record on close().
+
+    For a sharded run (shard is (i, N), see shard.py) the text report lines
+    also go into the JSONL file: each file record carries the lines of its
+    section (see start_section), lines no record took are written as
+    {"preamble": [...]} or {"section": path, "text": [...]} entries, and the
+    summary notes the shard, so merge_reports() can rebuild the report of a
+    single run.
+    """
+
+    def __init__(self, output_file, shard=None):
+        output_file = Path(output_file)
+        self.output_file = output_file
+        self.jsonl_file = output_file.with_suffix(".jsonl")
+        self.csv_file = output_file.with_suffix(".csv")
+        self._text = output_file.open("w", encoding="utf-8")
+        self._jsonl = self.jsonl_file.open("w", encoding="utf-8")
+        self._csv_out = self.csv_file.open("w", encoding="utf-8", newline="")
+        self._csv = csv.writer(self._csv_out)
+        self._csv.writerow(CSV_FIELDS)
+        self._first_line = True
+        self.files = 0
+        self.errors = 0
+        self.modified = 0
+        self.rules = {}
+        self._worst = []
+        self.shard = shard
+        # text lines not yet attached to a record, kept for sharded runs only
+        self._block = None if shard is None else []
+        self._section = None
+
+    def line(self, text):
+        """Add one line (or several, separated by newlines) to the text report."""
+        if not self._first_line:
+            self._text.write("\n")
+        self._text.write(text)
+        self._first_line = False
+        if self._block is not None:
+            self._block.append(text)
+
+    def start_section(self, path):
+        """Start the part of the text report about path, a file or folder.
+
+        Merged sharded reports put these parts in path order; lines before the
+        first section are the preamble.
+        """
+        self._flush_block()
+        self._section = str(path)
+
+    def start_file(self, file_path):
+        """Start the text report section of one file."""
+        self.start_section(file_path)
+        self.line(f"\n📄 Checking file: {file_path}")
+
+    def _flush_block(self):
+        if not self._block:
+            return
+        if self._section is None:
+            entry = {"preamble": self._block}
+        else:
+            entry = {"section": self._section, "text": self._block}
+        self._jsonl.write(json.dumps(entry) + "\n")
+        self._block = []
+
+    def file_result(self, file_path, stats=None, error=None, modified=False, **extra):
+        """Record the outcome for one file in the JSONL/CSV reports and the totals."""
+        file_path = Path(file_path)
+        device = file_path.parent.name
+        record = {"file": str(file_path), "device": device, "stats": stats, "error": error,
+                  "modified": bool(modified)}
+        record.update(extra)
+        if self._block is not None:
+            if self._section is None:
+                self._flush_block()
+            record["text"] = self._block
+            self._block = []
+        self._jsonl.write(json.dumps(record) + "\n")
+
+        self.files += 1
+        if error is not None:
+            self.errors += 1
+        if modified:
+            self.modified += 1
+        failed = 0
+        for keyword, stat in (stats or {}).items():
+            self._csv.writerow([str(file_path), device, keyword, stat['expected_unit'], stat['pass'], stat['fail']])
+            total = self.rules.setdefault(keyword, {'expected_unit': stat['expected_unit'], 'pass': 0, 'fail': 0})
+            total['pass'] += stat['pass']
+            total['fail'] += stat['fail']
+            failed += stat['fail']
+        if failed:
+            # a min-heap of the WORST_DEVICES largest, earlier files winning ties
+            entry = (failed, -self.files, device, str(file_path))
+            if len(self._worst) < WORST_DEVICES:
+                heapq.heappush(self._worst, entry)
+            elif entry > self._worst[0]:
+                heapq.heapreplace(self._worst, entry)
+
+        # everything up to the last finished file survives a crash
+        self._text.flush()
+        self._jsonl.flush()
+        self._csv_out.flush()
+
+    def summary(self):
+        return {
+            "files": self.files,
+            "errors": self.errors,
+            "modified": self.modified,
+            "rules": self.rules,
+            "worst_devices": [{"device": device, "file": file, "fail": failed}
+                              for failed, _, device, file in sorted(self._worst, reverse=True)],
+        }
+
+    def close(self):
+        """Finish the reports; returns the end-of-run summary."""
+        summary = self.summary()
+        record = {"summary": summary}
+        if self.shard is not None:
+            self._flush_block()
+            record["shard"] = list(self.shard)
+        self._jsonl.write(json.dumps(record) + "\n")
+        for out in (self._text, self._jsonl, self._csv_out):
+            out.close()
+        return summary
+
+
+def merge_reports(jsonl_files, output_file):
+    """Combine the JSONL reports of the shards of a run into the reports a single run writes.
+
+    Files (and the other sections of the text report) are put in path order,
+    the order the unit checkers discover them in, so the text, JSONL and CSV
+    reports and the summary come out the same as from one run over the whole
+    tree. Returns the merged summary.
+    """
+    preamble, entries, shards, total = None, [], set(), None
+    for jsonl_file in jsonl_files:
+        with open(jsonl_file, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if "preamble" in entry:
+                    if preamble is None:
+                        preamble = entry["preamble"]
+                elif "summary" in entry:
+                    if "shard" not in entry:
+                        raise ValueError(f"{jsonl_file} is not the report of a sharded run")
+                    index, total_here = entry["shard"]
+                    if total not in (None, total_here):
+                        raise ValueError(f"{jsonl_file} is shard {index} of {total_here}, not of {total}")
+                    if index in shards:
+                        raise ValueError(f"shard {index}/{total_here} is given more than once")
+                    total = total_here
+                    shards.add(index)
+                else:
+                    entries.append(entry)
+    if total is None:
+        raise ValueError("no shard reports to merge")
+    missing = sorted(set(range(total)) - shards)
+    if missing:
+        print(f"⚠️ Missing shards {', '.join(f'{i}/{total}' for i in missing)}; the merged report is incomplete")
+
+    # stable, so the entries of one section keep the order they were written in
+    entries.sort(key=lambda entry: Path(entry.get("file") or entry["section"]))
+    report = ReportWriter(output_file)
+    for text in preamble or []:
+        report.line(text)
+    for entry in entries:
+        for text in entry.pop("text"):
+            report.line(text)
+        if "file" in entry:
+            del entry["device"]
+            report.file_result(entry.pop("file"), entry.pop("stats"), entry.pop("error"), entry.pop("modified"),
+                               **entry)
+    return report.close()
+
+
+def print_summary(summary):
+    """Print the per-rule totals and worst devices of a run."""
+    print(f"\n📊 {summary['files']} files checked, {summary['errors']} errors, {summary['modified']} modified")
+    for keyword, total in summary['rules'].items():
+        if total['fail']:
+            print(f"   ❌ {keyword} (Expected: '{total['expected_unit']}'): "
+                  f"{total['fail']} failed, {total['pass']} passed")
+    if summary['worst_devices']:
+        print("   Worst devices: " + ", ".join(f"{d['device']} ({d['fail']})" for d in summary['worst_devices']))
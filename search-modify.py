@@ -1,13 +1,24 @@
 from pathlib import Path
-import re
 import json
-from jsonpath_ng import parse
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from json_io import CHANGED, loads, read_bytes, write_json
+from journal import DEFAULT_JOURNAL_DIR, Journal, PendingJournal
+from manifest import Manifest, content_hash, rules_hash
+from metrics import METRICS, add_arguments, count, instrumented, phase
+from patches import PatchWriter
+from report import ReportWriter, print_summary
+from shard import add_shard_argument, in_shard, shard_path
+from unit_rules import check_units, compile_rules
+from watcher import DEBOUNCE, POLL_INTERVAL, make_watcher, watch_batches
 
 # CONFIGURATION
 search_root = Path("E:/temp_projects/json_values_checker/floor/")
 target_filename = "metadata.json"
 unit_rules_file = Path("E:/temp_projects/json_values_checker/keyword.json")
 output_file = Path("E:/temp_projects/json_values_checker/unit_check_report.txt")
+manifest_file = Path("E:/temp_projects/json_values_checker/unit_fix_manifest.json")
 
 def load_expected_units(file_path):
     """Load expected units from a JSON file."""
@@ -18,54 +29,111 @@ def load_expected_units(file_path):
         print(f"❌ Unit rules file not found: {file_path}")
         return {}
 
-def get_paths(d):
-    """Recursively yield JSONPath-like paths from JSON data."""
-    if isinstance(d, dict):
-        for key, value in d.items():
-            yield f'.{key}'
-            yield from (f'.{key}{p}' for p in get_paths(value))
-    elif isinstance(d, list):
-        for i, value in enumerate(d):
-            yield f'[{i}]'
-            yield from (f'[{i}]{p}' for p in get_paths(value))
-
-def check_units(json_data, expected_units, auto_fix=False):
-    """Check and optionally fix units for each key based on expected values."""
-    stats = {}
-    paths = ['$' + s for s in get_paths(json_data)]
-    modified = False  # Flag to track if we modified the JSON
-    
-    for keyword, expected_unit in expected_units.items():
-
-        
-        matching_paths = [p for p in paths if re.search(rf"\.{re.escape(keyword)}$", p, re.IGNORECASE)]
-        pass_count = 0
-        fail_count = 0
-
-        for path_str in matching_paths:
-            path_expr = parse(path_str)
-            matches = path_expr.find(json_data)
-
-            for match in matches:
-                if isinstance(match.value, dict):
-                    unit = match.value.get('units', None)
-                    if unit == expected_unit:
-                        pass_count += 1
-                    else:
-                        fail_count += 1
-                        if auto_fix:
-                            match.value['units'] = expected_unit
-                            modified = True
-
-        stats[keyword] = {
-            'expected_unit': expected_unit,
-            'pass': pass_count,
-            'fail': fail_count
-        }
-
-    return stats, modified
-
-def search_and_check_files(root_dir: Path, expected_units, auto_fix=False, folder_pattern="*"):
+def check_file(file_path, expected_units, auto_fix=False, dry_run=False):
+    """Check (and optionally fix) one metadata file; with dry_run the fixes are not saved.
+
+    Returns a dict with the per-rule stats, the auto-fix edits, whether the
+    file was rewritten, any error, the stat/content hash of what was read, the
+    stat of what was written and the journal entries of the write, so it can
+    be run in a worker process.
+    """
+    result = {'stats': None, 'edits': [], 'modified': False, 'error': None,
+              'stat': None, 'sha256': None, 'written': None, 'journal': []}
+    if not file_path.is_file():
+        return result
+    try:
+        result['stat'] = file_path.stat()
+        content = read_bytes(file_path)
+        result['sha256'] = content_hash(content)
+        json_data = loads(content)
+
+        expected_units = compile_rules(expected_units, "suffix")
+        result['stats'], corrections = check_units(json_data, expected_units, auto_fix, result['edits'])
+
+        if auto_fix and corrections and not dry_run:
+            pending = PendingJournal()
+            result['modified'] = write_json(file_path, json_data, content, pending, result['edits']) == CHANGED
+            result['journal'] = pending.entries
+            if result['modified']:
+                # lets --watch tell its own writes from edits made by someone else
+                result['written'] = file_path.stat()
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+_worker_args = None
+
+def _init_worker(expected_units, auto_fix, dry_run):
+    """Keep the compiled rules in the worker so they are pickled once per process."""
+    global _worker_args
+    _worker_args = (expected_units, auto_fix, dry_run)
+
+def _check_file_worker(file_path):
+    # hand this file's timings and counters back to the parent with the result
+    METRICS.reset()
+    result = check_file(file_path, *_worker_args)
+    result['metrics'] = METRICS.export()
+    return result
+
+def _check_files(file_paths, expected_units, auto_fix, dry_run, workers):
+    """Yield the check_file results for file_paths in order, from worker processes if workers > 1."""
+    if workers <= 1 or len(file_paths) <= 1:
+        for file_path in file_paths:
+            yield check_file(file_path, expected_units, auto_fix, dry_run)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(expected_units, auto_fix, dry_run)) as pool:
+        chunksize = max(1, len(file_paths) // (workers * 4))
+        yield from pool.map(_check_file_worker, file_paths, chunksize=chunksize)
+
+def _record_result(file_path, result, manifest=None, patch_writer=None, journal=None):
+    """Book a freshly checked file: metrics, journal, manifest and dry-run patch."""
+    if 'metrics' in result:
+        METRICS.merge(result.pop('metrics'))
+    if result['modified']:
+        count("files_modified")
+    if journal is not None:
+        for entry in result['journal']:
+            journal.record(*entry)
+    result['journal'] = []
+    if manifest is not None:
+        # a file with pending fixes (dry run) must be checked again by the next real run
+        if result['stats'] is not None and not result['edits'] and result['error'] is None:
+            manifest.record(file_path, result['stat'], result['sha256'], result['stats'])
+        else:
+            manifest.forget(file_path)
+    if patch_writer is not None and result['edits']:
+        patch_writer.write(file_path, result['edits'])
+
+def _report_file(report, file_path, result, dry_run=False):
+    """Write the report section of one checked file."""
+    report.start_file(file_path)
+    if result['stats'] is not None:
+        for key, stat in result['stats'].items():
+            report.line(f"🔍 Checking '{key}' (Expected: '{stat['expected_unit']}'):")
+            report.line(f"   ✅ Passed: {stat['pass']}")
+            report.line(f"   ❌ Failed: {stat['fail']}")
+
+        if result['modified']:
+            report.line("   ✏️ Units auto-corrected and file updated.")
+        elif dry_run and result['edits']:
+            report.line(f"   ✏️ Dry run: {len(result['edits'])} unit corrections written as a patch.")
+
+    if result['error'] is not None:
+        report.line(f"   ❌ Error processing file: {result['error']}")
+    report.file_result(file_path, result['stats'], result['error'], result['modified'],
+                       corrections=len(result['edits']))
+
+def _report_empty_folder(report, folder):
+    report.start_section(folder)
+    report.line(f"\n⚠️ No {target_filename} found in {folder}")
+
+def _close_report(report):
+    print_summary(report.close())
+    print(f"\n📝 Report saved to: {report.output_file} (records in {report.jsonl_file.name}, {report.csv_file.name})")
+
+def search_and_check_files(root_dir: Path, expected_units, auto_fix=False, folder_pattern="*", workers=1,
+                           manifest=None, patch_writer=None, journal=None, shard=None, results=None):
     """
     Search for metadata.json files in folders matching the specified pattern.
     
@@ -74,53 +142,230 @@ def search_and_check_files(root_dir: Path, expected_units, auto_fix=False, folde
         expected_units (dict): Dictionary of expected units
         auto_fix (bool): Whether to automatically fix unit mismatches
         folder_pattern (str): Pattern to match folder names (default: "EM-*")
+        workers (int): Number of worker processes to check files with (1 = serial)
+        manifest (Manifest): Previous results; unchanged files are not checked again
+        patch_writer (PatchWriter): Dry run - write auto-fixes as JSON Patches instead of saving them
+        journal (Journal): Record every rewritten file so the run can be undone
+        shard (tuple): (i, N) - only check the device folders in shard i of N, see shard.py
+        results (dict): If given, filled with the result of every file, as check_file returns them
+
+    Returns:
+        list: (folder, metadata files) for every matching folder, in report order
     """
-    # Find all matching folders first
-    matching_folders = [f for f in root_dir.glob(folder_pattern) if f.is_dir()]
+    # Find all matching folders first, in path order so sharded reports can be merged
+    with phase("discover"):
+        matching_folders = sorted(f for f in root_dir.glob(folder_pattern)
+                                  if f.is_dir() and in_shard(f / target_filename, root_dir, shard))
     
     if not matching_folders:
         print(f"No folders matching pattern '{folder_pattern}' found in {root_dir}")
-        return
+        # a shard still writes its (empty) report, so merge-reports.py sees every shard
+        if shard is None:
+            return []
 
-    report_lines = []
-    report_lines.append(f"🔍 Searching in folders matching '{folder_pattern}'")
+    expected_units = compile_rules(expected_units, "suffix")
+    dry_run = patch_writer is not None
 
-    for folder in matching_folders:
-        # Look for metadata.json in each matching folder
-        metadata_files = list(folder.glob(target_filename))
-        
-        if not metadata_files:
-            report_lines.append(f"\n⚠️ No {target_filename} found in {folder}")
+    # Look for metadata.json in each matching folder, keeping folder order for the report
+    with phase("discover"):
+        folder_files = [(folder, sorted(folder.glob(target_filename))) for folder in matching_folders]
+    all_files = [file_path for _, files in folder_files for file_path in files]
+    count("files_discovered", len(all_files))
+
+    # unchanged files keep the stats from the previous run
+    reused = {}
+    for file_path in all_files:
+        stats = manifest.lookup(file_path) if manifest else None
+        if stats is not None:
+            reused[file_path] = {'stats': stats, 'edits': [], 'modified': False, 'error': None}
+    to_check = [file_path for file_path in all_files if file_path not in reused]
+
+    # results are consumed in folder order as they come in, and reported straight away
+    checked = _check_files(to_check, expected_units, auto_fix, dry_run, workers)
+
+    report = ReportWriter(shard_path(output_file, shard), shard)
+    try:
+        report.line(f"🔍 Searching in folders matching '{folder_pattern}'")
+
+        for folder, metadata_files in folder_files:
+            if not metadata_files:
+                _report_empty_folder(report, folder)
+                continue
+
+            for file_path in metadata_files:
+                if file_path in reused:
+                    result = reused.pop(file_path)
+                else:
+                    result = next(checked)
+                    _record_result(file_path, result, manifest, patch_writer, journal)
+                if results is not None:
+                    results[file_path] = result
+                _report_file(report, file_path, result, dry_run)
+    finally:
+        checked.close()
+
+    if manifest:
+        manifest.save()
+        print(f"♻️ Reused previous results for {len(all_files) - len(to_check)} of {len(all_files)} files")
+
+    _close_report(report)
+    return folder_files
+
+def _is_own_write(file_path, st, results):
+    """True if file_path is still exactly as the last auto-fix of this process wrote it."""
+    written = results.get(file_path, {}).get('written')
+    return written is not None and (written.st_mtime_ns, written.st_size) == (st.st_mtime_ns, st.st_size)
+
+def recheck_changed(changed, root_dir: Path, expected_units, folders, results, folder_pattern="*", workers=1,
+                    manifest=None, patch_writer=None, journal=None, shard=None):
+    """Re-check only the changed metadata files and rewrite the report from the cached results.
+
+    folders ({folder: metadata files}) and results ({file: check_file result})
+    hold the state of the previous pass and are updated in place. Changed
+    files that are exactly as this process' own auto-fix wrote them, and paths
+    outside the checked folders, are ignored. Returns the number of files
+    re-checked or dropped, the report is only rewritten if that isn't 0.
+    """
+    pattern_depth = len(Path(folder_pattern).parts)
+    to_check, dropped = [], 0
+    for file_path in sorted(changed):
+        folder = file_path.parent
+        try:
+            relative = folder.relative_to(root_dir)
+        except ValueError:
+            continue
+        if (file_path.name != target_filename or len(relative.parts) != pattern_depth
+                or not relative.match(folder_pattern) or not in_shard(file_path, root_dir, shard)):
+            continue
+        try:
+            st = file_path.stat()
+        except OSError:
+            # deleted, or its whole folder was; a new folder without the file yet is listed as empty
+            results.pop(file_path, None)
+            if manifest is not None:
+                manifest.forget(file_path)
+            listed = folders.pop(folder, None)
+            if folder.is_dir():
+                folders[folder] = []
+            if listed != folders.get(folder):
+                dropped += 1
             continue
+        if _is_own_write(file_path, st, results):
+            continue
+        folders[folder] = [file_path]
+        to_check.append(file_path)
 
-        for file_path in metadata_files:
-            report_lines.append(f"\n📄 Checking file: {file_path}")
-            if file_path.is_file():
-                try:
-                    content = file_path.read_text(encoding='utf-8')
-                    json_data = json.loads(content)
+    if not to_check and not dropped:
+        return 0
+    print(f"\n👀 {len(to_check) + dropped} changed file(s), re-checking")
 
-                    file_stats, modified = check_units(json_data, expected_units, auto_fix)
+    dry_run = patch_writer is not None
+    for file_path, result in zip(to_check, _check_files(to_check, expected_units, True, dry_run, workers)):
+        _record_result(file_path, result, manifest, patch_writer, journal)
+        results[file_path] = result
+    if manifest:
+        manifest.save()
 
-                    for key, result in file_stats.items():
-                        report_lines.append(f"🔍 Checking '{key}' (Expected: '{result['expected_unit']}'):")
-                        report_lines.append(f"   ✅ Passed: {result['pass']}")
-                        report_lines.append(f"   ❌ Failed: {result['fail']}")
+    report = ReportWriter(shard_path(output_file, shard), shard)
+    report.line(f"🔍 Searching in folders matching '{folder_pattern}'")
+    for folder in sorted(folders):
+        if not folders[folder]:
+            _report_empty_folder(report, folder)
+        for file_path in folders[folder]:
+            _report_file(report, file_path, results[file_path], dry_run)
+    _close_report(report)
+    return len(to_check) + dropped
 
-                    if auto_fix and modified:
-                        file_path.write_text(json.dumps(json_data, indent=2), encoding='utf-8')
-                        report_lines.append("   ✏️ Units auto-corrected and file updated.")
-                
-                except Exception as e:
-                    report_lines.append(f"   ❌ Error processing file: {str(e)}")
+def watch_and_check(root_dir: Path, rules, folder_pattern="*", workers=1, manifest=None, patch_writer=None,
+                    journal=None, debounce=DEBOUNCE, poll_interval=POLL_INTERVAL, polling=False, shard=None):
+    """Check all files once, then keep the report up to date as metadata files or the unit rules change.
 
-    # Write report to file
-    output_file.write_text('\n'.join(report_lines), encoding='utf-8')
-    print(f"\n📝 Report saved to: {output_file}")
+    Each burst of changes (see watcher.watch_batches) re-checks only the files
+    that changed (see recheck_changed); a change to the rules re-checks
+    everything. Runs until interrupted with Ctrl+C.
+    """
+    # watch before the first pass, so nothing changed during it is missed
+    watcher = make_watcher(root_dir, folder_pattern, target_filename, [unit_rules_file], poll_interval, polling)
+    results = {}
+
+    def full_pass():
+        results.clear()
+        folder_files = search_and_check_files(root_dir, rules, auto_fix=True, folder_pattern=folder_pattern,
+                                              workers=workers, manifest=manifest, patch_writer=patch_writer,
+                                              journal=journal, shard=shard, results=results)
+        return dict(folder_files)
+
+    try:
+        folders = full_pass()
+        print(f"\n👀 Watching {root_dir} ({type(watcher).__name__}), Ctrl+C to stop")
+        for changed in watch_batches(watcher, debounce):
+            if unit_rules_file in changed:
+                try:
+                    expected_units = load_expected_units(unit_rules_file)
+                except ValueError as e:
+                    # e.g. caught half-way through being saved; the next save triggers another reload
+                    print(f"❌ Could not read unit rules {unit_rules_file}: {e}")
+                    expected_units = None
+                if expected_units:
+                    rules = compile_rules(expected_units, "suffix")
+                    manifest = Manifest(shard_path(manifest_file, shard), rules_hash(rules, "suffix"))
+                    print(f"🔄 Reloaded unit rules from {unit_rules_file}, re-checking everything")
+                    folders = full_pass()
+                    continue
+                print("⚠️ Keeping the previous unit rules")
+            recheck_changed(changed, root_dir, rules, folders, results, folder_pattern, workers,
+                            manifest, patch_writer, journal, shard)
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
+    finally:
+        watcher.close()
 
 # Update the main section to use the pattern
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check (and auto-fix) point units against keyword.json')
+    parser.add_argument('--root', default=str(search_root),
+                        help='Root directory holding the device folders')
+    parser.add_argument('--pattern', default="*",
+                        help='Folder name pattern to match (e.g., "EM-*")')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes (default: 1, serial)')
+    parser.add_argument('--full', action='store_true',
+                        help='Re-validate every file instead of reusing results for unchanged ones')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Do not modify any file; write the unit fixes as JSON Patches to --patch-file')
+    parser.add_argument('--patch-file', default="dry_run_patches.jsonl",
+                        help='JSONL output for --dry-run, one {"file", "patch"} object per file')
+    parser.add_argument('--journal-dir', default=DEFAULT_JOURNAL_DIR,
+                        help='Directory for the undo journal of fixed files ("" to disable)')
+    parser.add_argument('--watch', action='store_true',
+                        help='After the first pass keep running, re-checking files (and reloading the rules) '
+                             'as they change')
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE,
+                        help=f'--watch: seconds without changes before a burst is re-checked (default: {DEBOUNCE})')
+    parser.add_argument('--poll-interval', type=float, default=POLL_INTERVAL,
+                        help=f'--watch: seconds between scans where inotify is not available (default: {POLL_INTERVAL})')
+    parser.add_argument('--polling', action='store_true',
+                        help='--watch: scan for changes instead of using inotify')
+    add_shard_argument(parser)
+    add_arguments(parser)
+    args = parser.parse_args()
+
     expected_units = load_expected_units(unit_rules_file)
     if expected_units:
-        # Search in folders starting with "EM-"
-        search_and_check_files(search_root, expected_units, auto_fix=True, folder_pattern="*")
\ No newline at end of file
+        with instrumented(args.metrics, args.profile):
+            rules = compile_rules(expected_units, "suffix")
+            manifest = Manifest(shard_path(manifest_file, args.shard), rules_hash(rules, "suffix"), full=args.full)
+            patch_writer = PatchWriter(shard_path(args.patch_file, args.shard)) if args.dry_run else None
+            journal = Journal(args.journal_dir) if args.journal_dir and not args.dry_run else None
+            if args.watch:
+                watch_and_check(Path(args.root), rules, args.pattern, args.workers, manifest, patch_writer,
+                                journal, args.debounce, args.poll_interval, args.polling, args.shard)
+            else:
+                # Search in folders starting with "EM-"
+                search_and_check_files(Path(args.root), rules, auto_fix=True,
+                                       folder_pattern=args.pattern, workers=args.workers, manifest=manifest,
+                                       patch_writer=patch_writer, journal=journal, shard=args.shard)
+            if patch_writer is not None:
+                patch_writer.close()
+            if journal is not None:
+                journal.close()
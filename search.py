@@ -1,13 +1,20 @@
 from pathlib import Path
-import re
 import json
-from jsonpath_ng import parse
+import argparse
+
+from json_io import loads, read_bytes
+from manifest import Manifest, content_hash, rules_hash
+from metrics import add_arguments, count, instrumented, phase
+from report import ReportWriter, print_summary
+from shard import add_shard_argument, in_shard, shard_path
+from unit_rules import check_units, compile_rules
 
 # CONFIGURATION
 search_root = Path("E:/temp_projects/json_values_checker/floor/")
 target_filename = "metadata.json"
 unit_rules_file = Path("E:/temp_projects/json_values_checker/keyword.json")
 output_file = Path("E:/temp_projects/json_values_checker/unit_check_report.txt")
+manifest_file = Path("E:/temp_projects/json_values_checker/unit_check_manifest.json")
 
 def load_expected_units(file_path):
     """Load expected units from a JSON file."""
@@ -18,73 +25,58 @@ def load_expected_units(file_path):
         print(f"❌ Unit rules file not found: {file_path}")
         return {}
 
-def get_paths(d):
-    """Recursively yield JSONPath-like paths from JSON data."""
-    if isinstance(d, dict):
-        for key, value in d.items():
-            yield f'.{key}'
-            yield from (f'.{key}{p}' for p in get_paths(value))
-    elif isinstance(d, list):
-        for i, value in enumerate(d):
-            yield f'[{i}]'
-            yield from (f'[{i}]{p}' for p in get_paths(value))
-
-def check_units(json_data, expected_units):
-    """Check if units for each key match the expected ones."""
-    stats = {}
-    paths = ['$' + s for s in get_paths(json_data)]
-
-    for keyword, expected_unit in expected_units.items():
-        matching_paths = [p for p in paths if re.search(keyword, p, re.IGNORECASE)]
-        pass_count = 0
-        fail_count = 0
-
-        for path_str in matching_paths:
-            path_expr = parse(path_str)
-            matches = path_expr.find(json_data)
-
-            for match in matches:
-                if isinstance(match.value, dict):
-                    unit = match.value.get('units', None)
-                    if unit == expected_unit:
-                        pass_count += 1
-                    else:
-                        fail_count += 1
-
-        stats[keyword] = {
-            'expected_unit': expected_unit,
-            'pass': pass_count,
-            'fail': fail_count
-        }
-
-    return stats
-
-def search_and_check_files(root_dir: Path, expected_units):
-    matched_files = list(root_dir.rglob(target_filename))
+def search_and_check_files(root_dir: Path, expected_units, manifest=None, shard=None):
+    expected_units = compile_rules(expected_units, "search")
+    with phase("discover"):
+        # in path order, so reports are the same from run to run and sharded ones can be merged
+        matched_files = sorted(f for f in root_dir.rglob(target_filename) if in_shard(f, root_dir, shard))
+    count("files_discovered", len(matched_files))
     if not matched_files:
         print("No matching files found.")
-        return
+        # a shard still writes its (empty) report, so merge-reports.py sees every shard
+        if shard is None:
+            return
 
-    report_lines = []
+    report = ReportWriter(shard_path(output_file, shard), shard)
 
     for file_path in matched_files:
-        report_lines.append(f"\n📄 Checking file: {file_path}")
+        report.start_file(file_path)
         if file_path.is_file():
-            content = file_path.read_text(encoding='utf-8')
-            json_data = json.loads(content)
+            # unchanged files keep the stats from the previous run
+            file_stats = manifest.lookup(file_path) if manifest else None
+            if file_stats is None:
+                st = file_path.stat()
+                content = read_bytes(file_path)
+                json_data = loads(content)
 
-            file_stats = check_units(json_data, expected_units)
+                file_stats, _ = check_units(json_data, expected_units)
+                if manifest:
+                    manifest.record(file_path, st, content_hash(content), file_stats)
 
             for key, result in file_stats.items():
-                report_lines.append(f"🔍 Checking '{key}' (Expected: '{result['expected_unit']}'):")
-                report_lines.append(f"   ✅ Passed: {result['pass']}")
-                report_lines.append(f"   ❌ Failed: {result['fail']}")
+                report.line(f"🔍 Checking '{key}' (Expected: '{result['expected_unit']}'):")
+                report.line(f"   ✅ Passed: {result['pass']}")
+                report.line(f"   ❌ Failed: {result['fail']}")
+            report.file_result(file_path, file_stats)
 
-    # Write report to file
-    output_file.write_text('\n'.join(report_lines), encoding='utf-8')
-    print(f"\n📝 Report saved to: {output_file}")
+    if manifest:
+        manifest.save()
+        print(f"♻️ Reused previous results for {manifest.reused} of {len(matched_files)} files")
+
+    print_summary(report.close())
+    print(f"\n📝 Report saved to: {report.output_file} (records in {report.jsonl_file.name}, {report.csv_file.name})")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check point units against keyword.json')
+    parser.add_argument('--full', action='store_true',
+                        help='Re-validate every file instead of reusing results for unchanged ones')
+    add_shard_argument(parser)
+    add_arguments(parser)
+    args = parser.parse_args()
+
     expected_units = load_expected_units(unit_rules_file)
     if expected_units:
-        search_and_check_files(search_root, expected_units)
+        with instrumented(args.metrics, args.profile):
+            rules = compile_rules(expected_units, "search")
+            manifest = Manifest(shard_path(manifest_file, args.shard), rules_hash(rules, "search"), full=args.full)
+            search_and_check_files(search_root, rules, manifest, args.shard)
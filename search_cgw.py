@@ -1,13 +1,22 @@
 from pathlib import Path
-import re
 import json
-from jsonpath_ng import parse
+import argparse
+
+from json_io import CHANGED, loads, read_bytes, write_json
+from journal import DEFAULT_JOURNAL_DIR, Journal
+from manifest import Manifest, content_hash, rules_hash
+from metrics import add_arguments, count, instrumented, phase
+from patches import PatchWriter, unit_edits
+from report import ReportWriter, print_summary
+from shard import add_shard_argument, in_shard, shard_path
+from unit_rules import check_units, compile_rules
 
 # CONFIGURATION
 base_path = Path("E:/temp_projects/json_values_checker/floor/")
 target_filename = "metadata.json"
 unit_rules_file = Path("E:/temp_projects/json_values_checker/keyword.json")  # Path to expected units JSON
 output_file = Path("E:/temp_projects/json_values_checker/unit_check_report.txt")
+manifest_file = Path("E:/temp_projects/json_values_checker/cgw_check_manifest.json")
 
 def load_expected_units(file_path):
     """Load expected units from a JSON file."""
@@ -18,101 +27,115 @@ def load_expected_units(file_path):
         print(f"❌ Unit rules file not found: {file_path}")
         return {}
 
-def get_paths(d):
-    """Recursively yield JSONPath-like paths from JSON data."""
-    if isinstance(d, dict):
-        for key, value in d.items():
-            yield f'.{key}'
-            yield from (f'.{key}{p}' for p in get_paths(value))
-    elif isinstance(d, list):
-        for i, value in enumerate(d):
-            yield f'[{i}]'
-            yield from (f'[{i}]{p}' for p in get_paths(value))
-
 def apply_corrections(json_data, corrections):
-    """Update the JSON data with the correct unit values based on collected paths."""
-    print(corrections)
-    for path_str, correct_unit in corrections:
-        path_expr = parse(path_str)
-        matches = path_expr.find(json_data)
-        for match in matches:
-            if isinstance(match.value, dict):
-                match.value['units'] = correct_unit
-
-
-def check_units(json_data, expected_units):
-    """Check if units for each key match the expected ones, and collect paths needing correction."""
-    stats = {}
-    paths = ['$' + s for s in get_paths(json_data)]
-    corrections = []
-
-    for keyword, expected_unit in expected_units.items():
-        matching_paths = [p for p in paths if re.search(keyword, p, re.IGNORECASE)]
-        pass_count = 0
-        fail_count = 0
-
-        for path_str in matching_paths:
-            path_expr = parse(path_str)
-            matches = path_expr.find(json_data)
-
-            for match in matches:
-                if isinstance(match.value, dict):
-                    unit = match.value.get('units', None)
-                    if unit == expected_unit:
-                        pass_count += 1
-                    else:
-                        fail_count += 1
-                        corrections.append((path_str, expected_unit))
-
-        stats[keyword] = {
-            'expected_unit': expected_unit,
-            'pass': pass_count,
-            'fail': fail_count
-        }
-
-    return stats, corrections
-
-def run_cgw_folder_scan(base_path, expected_units):
-    report_lines = []
+    """Update the JSON data with the correct unit values based on collected matches.
+
+    Each correction is (path, pointer, node, unit) as returned by check_units.
+    """
+    print([(c[0], c[-1]) for c in corrections])
+    for _, _, node, correct_unit in corrections:
+        node['units'] = correct_unit
+
+
+def run_cgw_folder_scan(base_path, expected_units, manifest=None, patch_writer=None, journal=None, shard=None):
+    """Check every metadata file under base_path and correct wrong units.
+
+    With a patch_writer (dry run) corrections are written as JSON Patches instead of saved;
+    otherwise saved corrections are recorded in the journal, if one is given.
+    With a shard (i, N) only the device folders of that shard are checked, see shard.py.
+    """
+    expected_units = compile_rules(expected_units, "search")
+    report = ReportWriter(shard_path(output_file, shard), shard)
 
     # for i in range(50201, 1090208):  # inclusive of CGW-1090207
     #     folder_name = f"CGW-{i}"
     #     folder_path = base_path / folder_name
 
     if not base_path.exists():
-        report_lines.append(f"\n🚫 Missing folder: {base_path}")
+        report.line(f"\n🚫 Missing folder: {base_path}")
         
 
-    matched_files = list(base_path.rglob(target_filename))
+    with phase("discover"):
+        # in path order, so reports are the same from run to run and sharded ones can be merged
+        matched_files = sorted(f for f in base_path.rglob(target_filename) if in_shard(f, base_path, shard))
+    count("files_discovered", len(matched_files))
     if not matched_files:
-        report_lines.append(f"\n📁 Folder exists but no '{target_filename}' in: {base_path}")
+        # other shards may have files; a single run over the whole tree wouldn't report this then
+        message = f"\n📁 Folder exists but no '{target_filename}' in: {base_path}"
+        if shard is None:
+            report.line(message)
+        else:
+            print(message)
         
 
     for file_path in matched_files:
-        report_lines.append(f"\n📄 Checking file: {file_path}")
+        report.start_file(file_path)
+        file_stats, corrections, error, modified = None, [], None, False
         try:
-            content = file_path.read_text(encoding='utf-8')
-            json_data = json.loads(content)
-
-            file_stats, corrections = check_units(json_data, expected_units)
+            # unchanged files keep the stats from the previous run; they had nothing to correct
+            file_stats = manifest.lookup(file_path) if manifest else None
+            if file_stats is not None:
+                corrections = []
+            else:
+                st = file_path.stat()
+                content = read_bytes(file_path)
+                json_data = loads(content)
+
+                file_stats, corrections = check_units(json_data, expected_units)
+                if manifest and not corrections:
+                    manifest.record(file_path, st, content_hash(content), file_stats)
 
             for key, result in file_stats.items():
-                report_lines.append(f"🔍 Checking '{key}' (Expected: '{result['expected_unit']}'):")
-                report_lines.append(f"   ✅ Passed: {result['pass']}")
-                report_lines.append(f"   ❌ Failed: {result['fail']}")
-
-            if corrections:
-                report_lines.append(f"🔧 Applying {len(corrections)} corrections.")
+                report.line(f"🔍 Checking '{key}' (Expected: '{result['expected_unit']}'):")
+                report.line(f"   ✅ Passed: {result['pass']}")
+                report.line(f"   ❌ Failed: {result['fail']}")
+
+            if corrections and patch_writer is not None:
+                patch_writer.write(file_path, unit_edits(corrections))
+                report.line(f"📝 Dry run: {len(corrections)} corrections written as a patch.")
+            elif corrections:
+                report.line(f"🔧 Applying {len(corrections)} corrections.")
+                edits = unit_edits(corrections)
                 apply_corrections(json_data, corrections)
-                file_path.write_text(json.dumps(json_data, indent=2), encoding='utf-8')
-                report_lines.append("💾 File updated with corrected units.")
+                if write_json(file_path, json_data, content, journal, edits) == CHANGED:
+                    modified = True
+                    count("files_modified")
+                    report.line("💾 File updated with corrected units.")
         except Exception as e:
-            report_lines.append(f"❗ Error reading or parsing file {file_path}: {e}")
+            error = str(e)
+            report.line(f"❗ Error reading or parsing file {file_path}: {e}")
+        report.file_result(file_path, file_stats, error, modified, corrections=len(corrections))
 
-    output_file.write_text('\n'.join(report_lines), encoding='utf-8')
-    print(f"\n📝 CGW Report saved to: {output_file}")
+    if manifest:
+        manifest.save()
+        print(f"♻️ Reused previous results for {manifest.reused} of {len(matched_files)} files")
+
+    print_summary(report.close())
+    print(f"\n📝 CGW Report saved to: {report.output_file} (records in {report.jsonl_file.name}, {report.csv_file.name})")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Check and correct point units against keyword.json')
+    parser.add_argument('--full', action='store_true',
+                        help='Re-validate every file instead of reusing results for unchanged ones')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Do not modify any file; write the corrections as JSON Patches to --patch-file')
+    parser.add_argument('--patch-file', default="dry_run_patches.jsonl",
+                        help='JSONL output for --dry-run, one {"file", "patch"} object per file')
+    parser.add_argument('--journal-dir', default=DEFAULT_JOURNAL_DIR,
+                        help='Directory for the undo journal of corrected files ("" to disable)')
+    add_shard_argument(parser)
+    add_arguments(parser)
+    args = parser.parse_args()
+
     expected_units = load_expected_units(unit_rules_file)
     if expected_units:
-        run_cgw_folder_scan(base_path, expected_units)
+        with instrumented(args.metrics, args.profile):
+            rules = compile_rules(expected_units, "search")
+            manifest = Manifest(shard_path(manifest_file, args.shard), rules_hash(rules, "search"), full=args.full)
+            patch_writer = PatchWriter(shard_path(args.patch_file, args.shard)) if args.dry_run else None
+            journal = Journal(args.journal_dir) if args.journal_dir and not args.dry_run else None
+            run_cgw_folder_scan(base_path, rules, manifest, patch_writer, journal, args.shard)
+            if patch_writer is not None:
+                patch_writer.close()
+            if journal is not None:
+                journal.close()
@@ -0,0 +1,50 @@
+import argparse
+import hashlib
+from pathlib import Path
+
+
+def parse_shard(text):
+    """argparse type for --shard: 'i/N' -> (i, N), with 0 <= i < N."""
+    try:
+        index, total = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, e.g. 0/4, not {text!r}")
+    if total < 1 or not 0 <= index < total:
+        raise argparse.ArgumentTypeError(f"shard index must be 0..N-1, not {text!r}")
+    return index, total
+
+
+def add_shard_argument(parser):
+    """Add the --shard option the search/update entry points take."""
+    parser.add_argument('--shard', type=parse_shard, default=None, metavar='i/N',
+                        help='Only handle the device folders in shard i of N (0-based), picked by a stable '
+                             'hash of the folder name; combine the reports with merge-reports.py')
+
+
+def shard_of(device, total):
+    """The shard (0..total-1) a device folder name falls in, the same on every machine and run."""
+    digest = hashlib.sha256(device.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % total
+
+
+def device_of(file_path, root):
+    """The device folder of file_path: its first path component below root ("" for files in root)."""
+    parts = Path(file_path).relative_to(root).parts
+    return parts[0] if len(parts) > 1 else ""
+
+
+def in_shard(file_path, root, shard):
+    """True if file_path belongs to shard (an (i, N) pair); everything does without a shard."""
+    if shard is None:
+        return True
+    index, total = shard
+    return shard_of(device_of(file_path, root), total) == index
+
+
+def shard_path(path, shard):
+    """path with the shard in its name, so shards sharing a directory don't clobber each other's files:
+    unit_check_report.txt -> unit_check_report.shard-0-of-4.txt."""
+    path = Path(path)
+    if shard is None:
+        return path
+    return path.with_name(f"{path.stem}.shard-{shard[0]}-of-{shard[1]}{path.suffix}")
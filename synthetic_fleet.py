@@ -0,0 +1,133 @@
+from pathlib import Path
+import argparse
+import json
+import random
+import uuid
+
+from openpyxl import Workbook
+
+from json_io import dump_json
+from register import REGISTER_COLUMNS, REGISTER_SHEET, REGISTER_SKIPROWS
+
+# point names as they appear in floor/*/metadata.json and devices/VAV-70/metadata.json
+POINT_NAMES = [
+    "supply_air_damper_percentage_command", "supply_air_flowrate_setpoint", "zone_air_temperature_sensor",
+    "supply_air_flowrate_sensor", "zone_air_cooling_temperature_setpoint", "zone_occupancy_status",
+    "supply_air_temperature_sensor", "fire_alarm_status", "cooling_valve_percentage_command",
+    "entering_cooling_coil_temperature_sensor", "leaving_cooling_coil_temperature_sensor", "run_status",
+]
+UNITS = ["percent", "cubic_feet_per_minute", "degrees_celsius", "no_units", "", "Degrees-Celsius", "Minutes"]
+DEVICE_PREFIXES = ["EM", "VAV", "CGW", "AHU"]
+
+
+def make_metadata(name, points, depth, rules, rng, error_rate=0.1):
+    """A metadata.json document shaped like the floor samples, with points under depth extra levels."""
+    rule_names = list(rules)
+    point_map = {}
+    suffix = rng.choice(["", "_98", f"_{rng.randint(1000, 1999)}"])
+    for i in range(points):
+        if rule_names and i % 2 == 0:
+            base = rng.choice(rule_names)
+            unit = rules[base] if isinstance(rules[base], str) else rules[base].get("units")
+        else:
+            base = rng.choice(POINT_NAMES)
+            unit = rng.choice(UNITS)
+        point = {"ref": f"AV:{rng.randint(1, 999)}.present_value", "units": unit}
+        if rng.random() < error_rate:
+            if rng.random() < 0.5:
+                del point["units"]
+            else:
+                point["units"] = "wrong_units"
+        key = f"{base}{suffix}"
+        while key in point_map:
+            key = f"{base}_{len(point_map)}"
+        point_map[key] = point
+
+    # nest the points depth levels deep: points -> group_0 -> group_1 -> ...
+    for level in reversed(range(depth)):
+        point_map = {f"group_{level}": point_map}
+
+    site = "IN-BLR-ANANTA"
+    return {
+        "version": "1.4.2",
+        "timestamp": "2024-11-04T10:02:28Z",
+        "system": {
+            "location": {"site": site, "section": f"{site}-{rng.randint(1, 9)}"},
+            "physical_tag": {"asset": {"guid": f"uuid://{uuid.UUID(int=rng.getrandbits(128))}",
+                                       "site": site, "name": name}},
+        },
+        "pointset": {"points": point_map},
+        "cloud": {"connection_type": "PROXIED", "config": {"static_file": "config.json"}},
+        "gateway": {"gateway_id": f"HLI-{rng.randint(1, 99)}"},
+        "localnet": {"families": {"bacnet": {"addr": str(rng.randint(10000, 99999))}}},
+    }
+
+
+def make_fleet(root, devices=100, points=80, depth=0, rules=None, seed=0, error_rate=0.1,
+               filename="metadata.json"):
+    """Write root/<DEVICE>/<filename> for devices synthetic devices; returns the device names."""
+    rng = random.Random(seed)
+    root = Path(root)
+    names = []
+    for i in range(devices):
+        name = f"{DEVICE_PREFIXES[i % len(DEVICE_PREFIXES)]}-{400000 + i}"
+        device_dir = root / name
+        device_dir.mkdir(parents=True, exist_ok=True)
+        doc = make_metadata(name, points, depth, rules or {}, rng, error_rate)
+        (device_dir / filename).write_bytes(dump_json(doc))
+        names.append(name)
+    return names
+
+
+def make_register(register_file, device_names, seed=0, repeats=1):
+    """Write a device register workbook laid out like Appendix 6 for device_names.
+
+    Every device gets repeats rows; values mix numbers, text needing
+    sanitizing ('A & B', 'x/y', spaces) and blank cells.
+    """
+    rng = random.Random(seed)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = REGISTER_SHEET
+    for _ in range(REGISTER_SKIPROWS):
+        ws.append(["Digital Building Device Register"])
+    ws.append(list(REGISTER_COLUMNS))
+    for _ in range(repeats):
+        for name in device_names:
+            ws.append([
+                name,
+                rng.choice([1, 2, 3, "G", "B 1", ""]),
+                rng.choice(["Zone A", "North & South", "Plant/Room", "Lobby", ""]),
+                rng.choice(["P1", "DB 2", "MCC/3", ""]),
+            ])
+    wb.save(register_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic device fleet and matching register')
+    parser.add_argument('--out', default="synthetic_fleet", help='Directory to write the device folders to')
+    parser.add_argument('--devices', type=int, default=100, help='Number of devices (default: 100)')
+    parser.add_argument('--points', type=int, default=80, help='Points per device (default: 80)')
+    parser.add_argument('--depth', type=int, default=0,
+                        help='Extra nesting levels under pointset.points (default: 0, like the samples)')
+    parser.add_argument('--rules', default="keyword.json",
+                        help='Unit rules to draw point names and units from (default: keyword.json)')
+    parser.add_argument('--error-rate', type=float, default=0.1,
+                        help='Share of points with a wrong or missing unit (default: 0.1)')
+    parser.add_argument('--register', default=None, help='Also write a register workbook to this path')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    args = parser.parse_args()
+
+    rules = {}
+    if args.rules and Path(args.rules).exists():
+        with open(args.rules, "r", encoding="utf-8") as f:
+            rules = json.load(f)
+    names = make_fleet(args.out, args.devices, args.points, args.depth, rules, args.seed, args.error_rate)
+    print(f"📂 Wrote {len(names)} devices to {args.out}")
+    if args.register:
+        make_register(args.register, names, args.seed)
+        print(f"📊 Wrote register {args.register}")
+
+
+if __name__ == "__main__":
+    main()
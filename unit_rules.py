@@ -0,0 +1,226 @@
+import re
+from collections import deque
+
+from json_index import format_path, walk
+from metrics import count, phase
+from patches import pointer_from_keys
+
+# Match modes used by the unit checkers:
+#   "search" - re.search(keyword, path, re.IGNORECASE), keyword anywhere in the path
+#   "suffix" - re.search(rf"\.{re.escape(keyword)}$", path, re.IGNORECASE), path ends with the key
+MATCH_MODES = ("search", "suffix")
+# paths whose matching rules are remembered; device files share most of their paths
+MATCH_CACHE_SIZE = 100000
+
+
+def _is_plain(keyword):
+    """True if keyword matches itself literally and lowercasing is enough for IGNORECASE."""
+    return keyword.isascii() and re.escape(keyword) == keyword
+
+
+def _build_automaton(words):
+    """Build an Aho-Corasick automaton for (lowercased word, rule index) pairs."""
+    goto, fail, out = [{}], [0], [[]]
+    for word, idx in words:
+        state = 0
+        for ch in word:
+            nxt = goto[state].get(ch)
+            if nxt is None:
+                nxt = len(goto)
+                goto.append({})
+                fail.append(0)
+                out.append([])
+                goto[state][ch] = nxt
+            state = nxt
+        out[state].append(idx)
+
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for ch, nxt in goto[state].items():
+            queue.append(nxt)
+            f = fail[state]
+            while f and ch not in goto[f]:
+                f = fail[f]
+            fail[nxt] = goto[f].get(ch, 0)
+            out[nxt] = out[nxt] + out[fail[nxt]]
+    return goto, fail, out
+
+
+def _parse_rule(keyword, spec, mode):
+    """(unit, mode) of a keyword.json entry: "unit", or {"units": "unit", "match": "suffix"}."""
+    if isinstance(spec, dict):
+        mode = spec.get("match", mode)
+        spec = spec.get("units")
+    if mode not in MATCH_MODES:
+        raise ValueError(f"Unknown match mode for '{keyword}': {mode}")
+    return spec, mode
+
+
+class RuleSet:
+    """keyword.json rules compiled once into a matcher that tests each path against all rules.
+
+    Every rule has its own match mode; mode is the default for rules that
+    don't name one. Plain keywords are looked up by point name ("suffix") or
+    found with a single Aho-Corasick scan of the path ("search"); anything
+    that really is a regular expression is precompiled and, unless one of them
+    has capture groups, tried only when a combined pattern of all of them
+    matches. The rules matching each path are
+    remembered, so a fleet of similar devices is mostly dictionary lookups.
+    """
+
+    def __init__(self, expected_units, mode="search"):
+        if mode not in MATCH_MODES:
+            raise ValueError(f"Unknown match mode: {mode}")
+        self.mode = mode
+        self.rules = []
+        self.modes = []
+        for keyword, spec in expected_units.items():
+            unit, rule_mode = _parse_rule(keyword, spec, mode)
+            self.rules.append((keyword, unit))
+            self.modes.append(rule_mode)
+        self.by_tail = {}
+        self.always = []
+        self.patterns = []
+        self.prefilter = None
+        self.automaton = None
+        self._cache = {}
+
+        words = []
+        for idx, (keyword, _) in enumerate(self.rules):
+            if self.modes[idx] == "suffix":
+                if keyword.isascii():
+                    suffix = "." + keyword.lower()
+                    tail = suffix.rsplit(".", 1)[-1]
+                    # dotted keywords need the rest of the suffix checked too
+                    check = suffix if "." in keyword else None
+                    self.by_tail.setdefault(tail, []).append((idx, check))
+                else:
+                    self.patterns.append((idx, re.compile(rf"\.{re.escape(keyword)}$", re.IGNORECASE)))
+            elif keyword == "":
+                self.always.append(idx)
+            elif _is_plain(keyword):
+                words.append((keyword.lower(), idx))
+            else:
+                self.patterns.append((idx, re.compile(keyword, re.IGNORECASE)))
+
+        if words:
+            self.automaton = _build_automaton(words)
+        # combining renumbers capture groups, which would silently change what a
+        # backreference like (x)\1 matches, so patterns with groups go without one
+        if len(self.patterns) > 1 and all(p.groups == 0 for _, p in self.patterns):
+            try:
+                self.prefilter = re.compile(
+                    "|".join(f"(?:{p.pattern})" for _, p in self.patterns), re.IGNORECASE
+                )
+            except re.error:
+                # e.g. inline flags don't survive being combined
+                self.prefilter = None
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, path):
+        """Return the indices of every rule matching path, in rule order."""
+        hits = self._cache.get(path)
+        if hits is None:
+            if len(self._cache) >= MATCH_CACHE_SIZE:
+                self._cache.clear()
+            hits = self._cache[path] = tuple(self._match(path))
+        return hits
+
+    def match_keys(self, keys):
+        """Like match(), for a path given as a keys tuple (see json_index.walk).
+
+        The path is only formatted the first time a keys tuple is seen.
+        """
+        hits = self._cache.get(keys)
+        if hits is None:
+            if len(self._cache) >= MATCH_CACHE_SIZE:
+                self._cache.clear()
+            hits = self._cache[keys] = tuple(self._match(format_path(keys)))
+        return hits
+
+    def _match(self, path):
+        hits = list(self.always)
+        if self.by_tail:
+            candidates = self.by_tail.get(path.rsplit(".", 1)[-1].lower())
+            if candidates:
+                lowered = None
+                for idx, check in candidates:
+                    if check is not None:
+                        if lowered is None:
+                            lowered = path.lower()
+                        if not lowered.endswith(check):
+                            continue
+                    hits.append(idx)
+        if self.automaton:
+            goto, fail, out = self.automaton
+            found = set()
+            state = 0
+            for ch in path.lower():
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(ch, 0)
+                if out[state]:
+                    found.update(out[state])
+            hits.extend(found)
+        if self.patterns and (self.prefilter is None or self.prefilter.search(path)):
+            hits.extend(idx for idx, pattern in self.patterns if pattern.search(path))
+        if len(hits) > 1:
+            hits.sort()
+        return hits
+
+
+def compile_rules(expected_units, mode="search"):
+    """Compile an expected-units mapping, passing an already compiled RuleSet through."""
+    if isinstance(expected_units, RuleSet):
+        return expected_units
+    return RuleSet(expected_units, mode)
+
+
+def check_units(json_data, rules, fix=False, edits=None):
+    """Check the 'units' of every dict in json_data against the rules matching its path.
+
+    Returns (stats, corrections): {keyword: {'expected_unit', 'pass', 'fail'}}
+    in rule order, and the failing (path, pointer, node, expected unit)
+    corrections, also in rule order; pointer is the JSON Pointer of node.
+    With fix, a wrong unit is corrected as soon as it is found, so a later
+    rule sees the corrected value, and recorded in edits (if given) as
+    (op, pointer, old, new) in document order.
+    """
+    counts = [[0, 0] for _ in range(len(rules))]
+    corrections_by_rule = [[] for _ in range(len(rules))]
+
+    with phase("check"):
+        for keys, _, _, value in walk(json_data):
+            # only dict values can carry 'units'
+            if not isinstance(value, dict):
+                continue
+            for idx in rules.match_keys(keys):
+                expected_unit = rules.rules[idx][1]
+                if value.get('units', None) == expected_unit:
+                    counts[idx][0] += 1
+                    continue
+                counts[idx][1] += 1
+                pointer = pointer_from_keys(keys)
+                corrections_by_rule[idx].append((format_path(keys), pointer, value, expected_unit))
+                if fix:
+                    if edits is not None:
+                        if 'units' in value:
+                            edits.append(("replace", pointer + "/units", value['units'], expected_unit))
+                        else:
+                            edits.append(("add", pointer + "/units", None, expected_unit))
+                    value['units'] = expected_unit
+    count("files_checked")
+    count("nodes_matched", sum(p + f for p, f in counts))
+
+    stats = {}
+    for (keyword, expected_unit), (pass_count, fail_count) in zip(rules.rules, counts):
+        stats[keyword] = {
+            'expected_unit': expected_unit,
+            'pass': pass_count,
+            'fail': fail_count
+        }
+    corrections = [c for rule_corrections in corrections_by_rule for c in rule_corrections]
+    return stats, corrections
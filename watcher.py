@@ -0,0 +1,187 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+POLL_INTERVAL = 2.0
+# a burst of changes is handled once no more came in for this long
+DEBOUNCE = 1.0
+
+# from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct("iIII")
+
+
+def _load_inotify():
+    """libc's inotify functions, or None where there is no inotify (Windows, macOS)."""
+    if not hasattr(os, "O_CLOEXEC"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class PollingWatcher:
+    """Notice changed files by comparing (mtime, size) snapshots every interval seconds.
+
+    Watches root/<folder_pattern>/<filename>, the files search-modify.py
+    checks, plus any extra_files (e.g. the unit rules).
+    """
+
+    def __init__(self, root, folder_pattern, filename, extra_files=(), interval=POLL_INTERVAL):
+        self.root = Path(root)
+        self.folder_pattern = folder_pattern
+        self.filename = filename
+        self.extra_files = [Path(f) for f in extra_files]
+        self.interval = interval
+        self._state = self._snapshot()
+
+    def _snapshot(self):
+        state = {}
+        files = [folder / self.filename for folder in self.root.glob(self.folder_pattern)]
+        for file_path in files + self.extra_files:
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            state[file_path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def poll(self, timeout=None):
+        """Wait up to timeout seconds (forever if None) for changes; return the changed paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.interval if deadline is None else max(0.0, min(self.interval, deadline - time.monotonic()))
+            time.sleep(wait)
+            state = self._snapshot()
+            changed = {path for path in state.keys() | self._state.keys()
+                       if state.get(path) != self._state.get(path)}
+            self._state = state
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Same as PollingWatcher, but told about changes by the kernel instead of looking.
+
+    Watches root for new device folders, every device folder matching
+    folder_pattern and the folders of the extra files.
+    """
+
+    def __init__(self, libc, root, folder_pattern, filename, extra_files=()):
+        self.libc = libc
+        self.root = Path(root)
+        self.folder_pattern = folder_pattern
+        self.filename = filename
+        self.extra_files = {Path(f) for f in extra_files}
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        self._add_watch(self.root)
+        for folder in self.root.glob(folder_pattern):
+            if folder.is_dir():
+                self._add_device_watch(folder)
+        for file_path in self.extra_files:
+            self._add_watch(file_path.parent)
+
+    def _add_watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"cannot watch {directory}: {os.strerror(err)}")
+        self._dirs[wd] = Path(directory)
+
+    def _add_device_watch(self, folder):
+        """Watch a device folder; False if it was gone (or no folder) by then, e.g. a copy tool's temp dir."""
+        try:
+            self._add_watch(folder)
+        except OSError as e:
+            if e.errno in (errno.ENOENT, errno.ENOTDIR):
+                return False
+            raise
+        return True
+
+    def poll(self, timeout=None):
+        """Wait up to timeout seconds (forever if None) for changes; return the changed paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self.fd], [], [], wait)
+            if not readable:
+                return set()
+            changed = self._read_events()
+            if changed:
+                return changed
+
+    def _read_events(self):
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                # events were dropped; report everything so the caller re-checks it all
+                changed.update(folder / self.filename for folder in self.root.glob(self.folder_pattern))
+                changed.update(self.extra_files)
+                continue
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if (directory == self.root and mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO)
+                    and path.match(self.folder_pattern)):
+                # a new device folder; its file may already be there by the time it is watched
+                if self._add_device_watch(path):
+                    changed.add(path / self.filename)
+            elif path.name == self.filename and directory != self.root:
+                changed.add(path)
+            elif path in self.extra_files:
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def make_watcher(root, folder_pattern, filename, extra_files=(), interval=POLL_INTERVAL, polling=False):
+    """An InotifyWatcher where the OS has inotify, else a PollingWatcher."""
+    libc = None if polling else _load_inotify()
+    if libc is not None:
+        try:
+            return InotifyWatcher(libc, root, folder_pattern, filename, extra_files)
+        except OSError as e:
+            print(f"⚠️ inotify unavailable ({e}), polling every {interval}s instead")
+    return PollingWatcher(root, folder_pattern, filename, extra_files, interval)
+
+
+def watch_batches(watcher, debounce=DEBOUNCE):
+    """Yield sets of changed paths, each once no more changes came in for debounce seconds."""
+    while True:
+        changed = watcher.poll()
+        while True:
+            more = watcher.poll(debounce)
+            if not more:
+                break
+            changed |= more
+        yield changed